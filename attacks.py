@@ -0,0 +1,48 @@
+"""Precomputed attack tables shared by move generation and evaluation
+
+Squares are (row, col) pairs and the tables are indexed by row * 8 + col.
+"""
+
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+
+def _square_table(offsets):
+    """For every square (row * 8 + col), the on-board squares at the given offsets"""
+    return [tuple((row + dr, col + dc) for dr, dc in offsets if 0 <= row + dr < 8 and 0 <= col + dc < 8)
+            for row in range(8) for col in range(8)]
+
+
+def _ray_table(directions):
+    """For every square, the squares along each direction out to the edge"""
+    table = []
+    for row in range(8):
+        for col in range(8):
+            rays = []
+            for dr, dc in directions:
+                ray = []
+                r, c = row + dr, col + dc
+                while 0 <= r < 8 and 0 <= c < 8:
+                    ray.append((r, c))
+                    r += dr
+                    c += dc
+                if ray:
+                    rays.append(tuple(ray))
+            table.append(tuple(rays))
+    return table
+
+
+KNIGHT_TARGETS = _square_table(KNIGHT_OFFSETS)
+KING_TARGETS = _square_table(KING_OFFSETS)
+ROOK_RAYS = _ray_table(ROOK_DIRECTIONS)
+BISHOP_RAYS = _ray_table(BISHOP_DIRECTIONS)
+QUEEN_RAYS = [rook + bishop for rook, bishop in zip(ROOK_RAYS, BISHOP_RAYS)]
+# Where a pawn has to stand to attack a square: white pawns attack upwards,
+# so they sit one row below it
+PAWN_SOURCES = {
+    True: _square_table(((1, -1), (1, 1))),
+    False: _square_table(((-1, -1), (-1, 1))),
+}
@@ -0,0 +1,354 @@
+"""Bitboard board backend: one 64-bit integer per piece type and color
+
+Squares are numbered row * 8 + col, the same way the list-of-lists board is
+indexed, so bit 0 is a8 and bit 63 is h1.
+
+Move generation and attack queries work on the bitboards, which makes
+perft about twice as fast as on the list backend. make_move(), hashing and
+evaluation still read and write the board square by square through the row
+views, the same code the list backend runs, so a search spends longer per
+node in evaluation than it does on lists.
+"""
+
+from attacks import KING_OFFSETS, KNIGHT_OFFSETS
+from core import (
+    BLACK_KINGSIDE, BLACK_QUEENSIDE, FLAG_CASTLING, FLAG_EN_PASSANT, PROMOTION_BITS, WHITE_KINGSIDE,
+    WHITE_QUEENSIDE,
+)
+
+PIECES = 'PNBRQKpnbrqk'
+WHITE_PIECES = 'PNBRQK'
+
+# Sliding pieces attack along lines; each line is a pair of opposite directions
+ROOK_LINES = (((0, -1), (0, 1)), ((-1, 0), (1, 0)))
+BISHOP_LINES = (((-1, -1), (1, 1)), ((-1, 1), (1, -1)))
+
+
+def square_index(row, col):
+    return row * 8 + col
+
+
+def _ray_squares(square, dr, dc):
+    """Squares from square (exclusive) to the edge of the board"""
+    row, col = divmod(square, 8)
+    squares = []
+    row += dr
+    col += dc
+    while 0 <= row < 8 and 0 <= col < 8:
+        squares.append(row * 8 + col)
+        row += dr
+        col += dc
+    return squares
+
+
+def _ray_attacks(rays, occupied):
+    """Walk each ray up to and including the first occupied square"""
+    attacks = 0
+    for ray in rays:
+        for target in ray:
+            attacks |= 1 << target
+            if occupied >> target & 1:
+                break
+    return attacks
+
+
+def _jump_table(offsets):
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        attacks = 0
+        for dr, dc in offsets:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                attacks |= 1 << (r * 8 + c)
+        table.append(attacks)
+    return table
+
+
+def _between_table():
+    """BETWEEN[a][b]: the squares strictly between a and b on a line, 0 if they aren't on one"""
+    table = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        for dr, dc in KING_OFFSETS:
+            between = 0
+            for target in _ray_squares(square, dr, dc):
+                table[square][target] = between
+                between |= 1 << target
+    return table
+
+
+def _line_tables(lines):
+    """For every square and line, map each relevant occupancy to its attack set
+
+    Edge squares never block anything beyond them, so they are left out of the
+    mask; that keeps each line to at most 64 occupancy patterns.
+    """
+    tables = []
+    for square in range(64):
+        square_lines = []
+        for directions in lines:
+            rays = [_ray_squares(square, dr, dc) for dr, dc in directions]
+            mask = 0
+            for ray in rays:
+                for target in ray[:-1]:
+                    mask |= 1 << target
+            lookup = {}
+            subset = 0
+            while True:
+                lookup[subset] = _ray_attacks(rays, subset)
+                subset = (subset - mask) & mask
+                if subset == 0:
+                    break
+            square_lines.append((mask, lookup))
+        tables.append(tuple(square_lines))
+    return tables
+
+
+KNIGHT_ATTACKS = _jump_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _jump_table(KING_OFFSETS)
+WHITE_PAWN_ATTACKS = _jump_table(((-1, -1), (-1, 1)))
+BLACK_PAWN_ATTACKS = _jump_table(((1, -1), (1, 1)))
+ROOK_TABLES = _line_tables(ROOK_LINES)
+BISHOP_TABLES = _line_tables(BISHOP_LINES)
+BETWEEN = _between_table()
+PROMOTION_RANKS = 0xFF | 0xFF << 56  # Rows 0 and 7
+# Castling: (right, squares that must be empty, squares the king crosses, king's end square) for each side
+CASTLING = {
+    True: ((WHITE_KINGSIDE, 3 << 61, (61, 62), 62), (WHITE_QUEENSIDE, 7 << 57, (59, 58), 58)),
+    False: ((BLACK_KINGSIDE, 3 << 5, (5, 6), 6), (BLACK_QUEENSIDE, 7 << 1, (3, 2), 2)),
+}
+
+
+def rook_attacks(square, occupied):
+    (rank_mask, rank_lookup), (file_mask, file_lookup) = ROOK_TABLES[square]
+    return rank_lookup[occupied & rank_mask] | file_lookup[occupied & file_mask]
+
+
+def bishop_attacks(square, occupied):
+    (diag_mask, diag_lookup), (anti_mask, anti_lookup) = BISHOP_TABLES[square]
+    return diag_lookup[occupied & diag_mask] | anti_lookup[occupied & anti_mask]
+
+
+def queen_attacks(square, occupied):
+    return rook_attacks(square, occupied) | bishop_attacks(square, occupied)
+
+
+def iter_squares(bitboard):
+    """Yield the index of every set bit, lowest first"""
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
+
+class BitboardBoard:
+    """Board with one bitboard per piece plus color occupancy masks
+
+    board[row][col] reads and writes the same one-character strings as the
+    list-of-lists board, so the drawing code, make_move() and the evaluation
+    work unchanged on top of it. generate_moves() is the bitboard move
+    generator core.generate_moves_into() hands over to.
+    """
+
+    def __init__(self, rows):
+        self.bitboards = dict.fromkeys(PIECES, 0)
+        self.squares = [' '] * 64  # Mailbox kept alongside for piece lookups
+        self.white_occupancy = 0
+        self.black_occupancy = 0
+        self.row_views = tuple(_RowView(self, row * 8) for row in range(8))
+        for row, line in enumerate(rows):
+            for col, piece in enumerate(line):
+                if piece != ' ':
+                    self.set_piece(row * 8 + col, piece)
+
+    @property
+    def occupied(self):
+        return self.white_occupancy | self.black_occupancy
+
+    def piece_at(self, square):
+        return self.squares[square]
+
+    def set_piece(self, square, piece):
+        """Put piece on square, or clear it when piece is ' '"""
+        bit = 1 << square
+        old = self.squares[square]
+        if old != ' ':
+            self.bitboards[old] ^= bit
+            if old in WHITE_PIECES:
+                self.white_occupancy ^= bit
+            else:
+                self.black_occupancy ^= bit
+        self.squares[square] = piece
+        if piece != ' ':
+            self.bitboards[piece] |= bit
+            if piece in WHITE_PIECES:
+                self.white_occupancy |= bit
+            else:
+                self.black_occupancy |= bit
+
+    def attackers_to(self, square, by_white, occupied=None):
+        """Bitboard of by_white's pieces attacking square, sliders seeing through to occupied if given"""
+        bb = self.bitboards
+        if occupied is None:
+            occupied = self.white_occupancy | self.black_occupancy
+        if by_white:
+            pawns, knights, bishops, rooks, queens, king = bb['P'], bb['N'], bb['B'], bb['R'], bb['Q'], bb['K']
+            # A white pawn attacks square from where a black pawn on square would attack
+            pawn_sources = BLACK_PAWN_ATTACKS[square]
+        else:
+            pawns, knights, bishops, rooks, queens, king = bb['p'], bb['n'], bb['b'], bb['r'], bb['q'], bb['k']
+            pawn_sources = WHITE_PAWN_ATTACKS[square]
+        return ((pawn_sources & pawns)
+                | (KNIGHT_ATTACKS[square] & knights)
+                | (KING_ATTACKS[square] & king)
+                | (bishop_attacks(square, occupied) & (bishops | queens))
+                | (rook_attacks(square, occupied) & (rooks | queens)))
+
+    def is_attacked(self, square, by_white):
+        return self.attackers_to(square, by_white) != 0
+
+    def generate_moves(self, buffer, start, white, en_passant, castling_rights, captures=True, quiets=True):
+        """Write packed legal moves into buffer from start and return where they end
+
+        The core.generate_moves_into contract, worked out on the bitboards:
+        pins and checks are found once from the king, so no move has to be
+        tried on the board. en_passant is a square index or -1.
+        """
+        bb = self.bitboards
+        if white:
+            own, enemy = self.white_occupancy, self.black_occupancy
+            pawns, knights, bishops, rooks, queens, king = bb['P'], bb['N'], bb['B'], bb['R'], bb['Q'], bb['K']
+            their_straight, their_diagonal = bb['r'] | bb['q'], bb['b'] | bb['q']
+            their_jumpers = bb['p'] | bb['n']
+            step = -8
+        else:
+            own, enemy = self.black_occupancy, self.white_occupancy
+            pawns, knights, bishops, rooks, queens, king = bb['p'], bb['n'], bb['b'], bb['r'], bb['q'], bb['k']
+            their_straight, their_diagonal = bb['R'] | bb['Q'], bb['B'] | bb['Q']
+            their_jumpers = bb['P'] | bb['N']
+            step = 8
+        occupied = own | enemy
+        empty = ~occupied & 0xFFFFFFFFFFFFFFFF
+        king_square = king.bit_length() - 1
+        end = start
+
+        # What a move may land on: enemy pieces for captures, empty squares for quiets
+        targets = (enemy if captures else 0) | (empty if quiets else 0)
+
+        # King moves, checked with the king lifted off the board so it can't
+        # hide behind itself from a slider
+        without_king = occupied ^ king
+        for to in iter_squares(KING_ATTACKS[king_square] & targets):
+            if not self.attackers_to(to, not white, without_king):
+                buffer[end] = king_square | to << 6
+                end += 1
+
+        checkers = self.attackers_to(king_square, not white)
+        if checkers & (checkers - 1):
+            return end  # Double check: only the king can move
+        # Out of check anything goes; in check, block or capture the checker
+        evasions = BETWEEN[king_square][checkers.bit_length() - 1] | checkers if checkers else -1
+
+        # A piece alone between the king and an enemy slider may only move along that line
+        pins = {}
+        snipers = ((rook_attacks(king_square, enemy) & their_straight)
+                   | (bishop_attacks(king_square, enemy) & their_diagonal))
+        for sniper in iter_squares(snipers):
+            blockers = BETWEEN[king_square][sniper] & occupied
+            if blockers & own and not blockers & (blockers - 1):
+                pins[blockers.bit_length() - 1] = BETWEEN[king_square][sniper] | 1 << sniper
+
+        for pieces, attacks in ((knights, None), (bishops, bishop_attacks), (rooks, rook_attacks),
+                                (queens, queen_attacks)):
+            for square in iter_squares(pieces):
+                moves = (KNIGHT_ATTACKS[square] if attacks is None else attacks(square, occupied)) & targets & evasions
+                if square in pins:
+                    moves &= pins[square]
+                for to in iter_squares(moves):
+                    buffer[end] = square | to << 6
+                    end += 1
+
+        pawn_attacks = WHITE_PAWN_ATTACKS if white else BLACK_PAWN_ATTACKS
+        for square in iter_squares(pawns):
+            allowed = evasions & pins[square] if square in pins else evasions
+            to = square + step
+            # Pushes are quiet unless they promote
+            if empty >> to & 1:
+                if PROMOTION_RANKS >> to & 1:
+                    if captures and allowed >> to & 1:
+                        for bits in PROMOTION_BITS:
+                            buffer[end] = square | to << 6 | bits
+                            end += 1
+                elif quiets:
+                    if allowed >> to & 1:
+                        buffer[end] = square | to << 6
+                        end += 1
+                    double = to + step
+                    if (square >> 3 == (6 if white else 1) and empty >> double & 1 and allowed >> double & 1):
+                        buffer[end] = square | double << 6
+                        end += 1
+            if not captures:
+                continue
+            for to in iter_squares(pawn_attacks[square] & enemy & allowed):
+                if PROMOTION_RANKS >> to & 1:
+                    for bits in PROMOTION_BITS:
+                        buffer[end] = square | to << 6 | bits
+                        end += 1
+                else:
+                    buffer[end] = square | to << 6
+                    end += 1
+            if en_passant >= 0 and pawn_attacks[square] >> en_passant & 1:
+                # Two pawns leave the capturing row at once, so replay the
+                # slider attacks on the king with the new occupancy; a pawn
+                # or knight check other than the captured pawn stays
+                captured = en_passant - step
+                after = occupied ^ (1 << square | 1 << captured | 1 << en_passant)
+                if (not checkers & their_jumpers & ~(1 << captured)
+                        and not rook_attacks(king_square, after) & their_straight
+                        and not bishop_attacks(king_square, after) & their_diagonal):
+                    buffer[end] = square | en_passant << 6 | FLAG_EN_PASSANT
+                    end += 1
+
+        if quiets and not checkers and king_square == (60 if white else 4):
+            for right, between, crossed, king_end in CASTLING[white]:
+                if (castling_rights & right and not occupied & between
+                        and not any(self.attackers_to(square, not white) for square in crossed)):
+                    buffer[end] = king_square | king_end << 6 | FLAG_CASTLING
+                    end += 1
+        return end
+
+    def rows(self):
+        """Plain list-of-lists copy of the board"""
+        return [self.squares[row * 8:row * 8 + 8] for row in range(8)]
+
+    # Compatibility view: behave like a list of 8 rows
+
+    def __getitem__(self, row):
+        return self.row_views[row]
+
+    def __iter__(self):
+        return iter(self.row_views)
+
+    def __len__(self):
+        return 8
+
+
+class _RowView:
+    """One row of a BitboardBoard, indexable like a list of characters"""
+    __slots__ = ('board', 'offset')
+
+    def __init__(self, board, offset):
+        self.board = board
+        self.offset = offset
+
+    def __getitem__(self, col):
+        return self.board.squares[self.offset + col]
+
+    def __setitem__(self, col, piece):
+        self.board.set_piece(self.offset + col, piece)
+
+    def __iter__(self):
+        return iter(self.board.squares[self.offset:self.offset + 8])
+
+    def __len__(self):
+        return 8
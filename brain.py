@@ -0,0 +1,674 @@
+import multiprocessing
+import queue
+import time
+from array import array
+from multiprocessing import shared_memory
+
+from core import (
+    NO_MOVE, PROMOTION_ORDER, SQUARES, GameState, decode_move, generate_moves_into, is_legal, new_move_buffer, see,
+)
+from evaluation import evaluate
+
+# Bound types stored with each score
+EXACT = 0
+LOWER_BOUND = 1  # Search failed high, real score is at least this
+UPPER_BOUND = 2  # Search failed low, real score is at most this
+
+class TranspositionTable:
+    """Fixed-size table of search results keyed by Zobrist hash
+
+    Every bucket has two entries: a depth-preferred slot that keeps the deepest
+    search of a position and an always-replace slot for the latest one. An
+    entry is two 64-bit words, the key XORed with the data and the data
+    itself, so an entry only verifies against the key that wrote it. Moves
+    are stored packed as core.encode_move makes them.
+    """
+    BUCKET_BYTES = 32
+
+    def __init__(self, size_mb=16):
+        self.bucket_count = max(1, size_mb * 1024 * 1024 // self.BUCKET_BYTES)
+        self.table = array('Q', bytes(self.bucket_count * self.BUCKET_BYTES))
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def clear(self):
+        self.table = array('Q', bytes(self.bucket_count * self.BUCKET_BYTES))
+        self.hits = self.misses = self.collisions = 0
+
+    def probe(self, key):
+        """Return (move, score, bound, depth) stored for key, or None; move is packed, NO_MOVE if there is none"""
+        table = self.table
+        index = (key % self.bucket_count) * 4
+        occupied = False
+        for slot in (index, index + 2):
+            data = table[slot + 1]
+            if data:
+                if table[slot] ^ data == key:
+                    self.hits += 1
+                    return (data & 0xFFFF, (data >> 16 & 0xFFFF) - 32768,
+                            data >> 40 & 3, data >> 32 & 0xFF)
+                occupied = True
+        self.misses += 1
+        if occupied:
+            self.collisions += 1
+        return None
+
+    def store(self, key, move, score, bound, depth):
+        """Save a search result, keeping the deepest one in the first slot"""
+        table = self.table
+        index = (key % self.bucket_count) * 4
+        score = max(-32767, min(32767, score)) + 32768
+        # Bit 42 marks the entry as used so data is never zero
+        data = move | score << 16 | max(0, min(depth, 255)) << 32 | bound << 40 | 1 << 42
+
+        stored = table[index + 1]
+        same_position = stored and table[index] ^ stored == key
+        if not stored or same_position or depth >= (stored >> 32 & 0xFF):
+            slot = index
+        else:
+            slot = index + 2
+        table[slot] = key ^ data
+        table[slot + 1] = data
+
+    def hashfull(self):
+        """Permille of the first thousand buckets in use, as reported by UCI engines"""
+        sample = min(self.bucket_count, 1000)
+        used = sum(1 for bucket in range(sample) if self.table[bucket * 4 + 1])
+        return used * 1000 // sample
+
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """Transposition table in shared memory, so several processes can use it at once
+
+    There are no locks: a write that races with another write or a read
+    leaves an entry whose two words don't XOR back to its key, and probe()
+    treats that as a miss. Create it in one process and attach with the same
+    name and size elsewhere.
+    """
+
+    def __init__(self, size_mb=16, name=None):
+        self.bucket_count = max(1, size_mb * 1024 * 1024 // self.BUCKET_BYTES)
+        size = self.bucket_count * self.BUCKET_BYTES
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.size_mb = size_mb
+        self.table = self.shm.buf[:size].cast('Q')
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def clear(self):
+        self.shm.buf[:self.bucket_count * self.BUCKET_BYTES] = bytes(self.bucket_count * self.BUCKET_BYTES)
+        self.hits = self.misses = self.collisions = 0
+
+    def close(self):
+        """Detach from the shared memory in this process"""
+        self.table.release()
+        self.shm.close()
+
+    def unlink(self):
+        """Free the shared memory; call once, from the creating process"""
+        self.shm.unlink()
+
+MATE = 30000
+MATE_BOUND = MATE - 1000  # Scores beyond this are mates, counted in plies
+INFINITY = 32000
+ASPIRATION_WINDOW = 50
+
+# Rough piece values for move ordering
+PIECE_VALUES = {'p': 100, 'n': 320, 'b': 330, 'r': 500, 'q': 900, 'k': 0}
+PROMOTION_VALUES = tuple(PIECE_VALUES[piece] for piece in PROMOTION_ORDER.lower())  # By the promotion bits of a packed move
+MAX_PLY = 128  # Deepest ply searched, quiescence included
+DELTA_MARGIN = 200  # Positional swing a capture may add on top of the material it wins
+
+
+def _to_tt_score(score, ply):
+    """Mate scores are stored relative to the node instead of the root"""
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_tt_score(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def branching_factor(iteration_nodes):
+    """Effective branching factor: the last iteration's nodes over the one before's
+
+    iteration_nodes holds the node count at the end of each completed depth,
+    in order, so an iteration's own nodes are the difference from the one
+    before. Quiescence nodes count towards the iteration that searched them.
+    Returns 0.0 until there are two iterations to compare.
+    """
+    if len(iteration_nodes) < 2:
+        return 0.0
+    last = iteration_nodes[-1] - iteration_nodes[-2]
+    previous = iteration_nodes[-2] - (iteration_nodes[-3] if len(iteration_nodes) > 2 else 0)
+    return last / previous if previous else 0.0
+
+
+class SearchStopped(Exception):
+    """Raised inside the tree when a time or node limit runs out"""
+
+
+class SearchStatistics:
+    """Counters and timers collected by every search it is passed to
+
+    Node, hash and cutoff counts are added when a search finishes. Time in
+    move generation, evaluation and check detection is measured as the
+    search runs by wrapping those calls, so a search without statistics runs
+    the plain functions and pays nothing for them.
+    """
+    TIMERS = ('movegen', 'eval', 'check')
+
+    def __init__(self):
+        self.searches = 0
+        self.nodes = 0
+        self.qnodes = 0
+        self.tt_hits = 0  # Probes that found an entry
+        self.cutoffs = 0  # Beta cutoffs in the main search
+        self.first_move_cutoffs = 0  # Of those, cutoffs by the first move searched
+        self.depth = 0  # Deepest completed iteration
+        self.iteration_nodes = {}  # Depth -> [searches reaching it, their node counts at its end summed]
+        self.time = 0.0
+        self.times = dict.fromkeys(self.TIMERS, 0.0)
+
+    def timed(self, name, function):
+        """function, adding the time each call takes to the name timer"""
+        times = self.times
+        clock = time.perf_counter
+
+        def timed_function(*args):
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                times[name] += clock() - start
+
+        return timed_function
+
+    def add(self, search):
+        self.searches += 1
+        self.nodes += search.nodes
+        self.qnodes += search.qnodes
+        self.tt_hits += search.tt_hits
+        self.cutoffs += search.cutoffs
+        self.first_move_cutoffs += search.first_move_cutoffs
+        self.depth = max(self.depth, search.completed_depth)
+        self.time += search.elapsed()
+        for depth, nodes in enumerate(search.iteration_nodes, search.first_depth):
+            totals = self.iteration_nodes.setdefault(depth, [0, 0])
+            totals[0] += 1
+            totals[1] += nodes
+
+    def branching_factor(self):
+        """brain.branching_factor over the depths every search completed"""
+        return branching_factor([nodes for _, (searches, nodes) in sorted(self.iteration_nodes.items())
+                                 if searches == self.searches])
+
+    def report(self):
+        def share(part, whole):
+            return f"{100 * part / whole:.1f}%" if whole else "-"
+
+        lines = [
+            f"searches {self.searches}  depth {self.depth}  nodes {self.nodes}  "
+            f"qnodes {self.qnodes} ({share(self.qnodes, self.nodes)})  EBF {self.branching_factor():.2f}",
+            f"tt hits {self.tt_hits} ({share(self.tt_hits, self.nodes)})  cutoffs {self.cutoffs}  "
+            f"first move {self.first_move_cutoffs} ({share(self.first_move_cutoffs, self.cutoffs)})",
+            f"time {self.time:.2f}s  " + '  '.join(
+                f"{name} {self.times[name]:.2f}s ({share(self.times[name], self.time)})" for name in self.TIMERS),
+        ]
+        return '\n'.join(lines)
+
+
+class Search:
+    """Iterative-deepening negamax alpha-beta with PVS and aspiration windows
+
+    The search stops at whichever of time_limit (seconds), node_limit or
+    max_depth is reached first and keeps the best move found so far.
+    on_iteration, if given, is called with the search after every completed
+    depth. tablebase (see tablebase.Tablebases) gives exact scores for the
+    endgames it covers, and stats (a SearchStatistics) collects counters and
+    timings.
+    """
+
+    def __init__(self, state, time_limit=None, node_limit=None, max_depth=None, tt=None,
+                 stop_event=None, first_depth=1, on_iteration=None, tablebase=None, stats=None):
+        self.state = state
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = min(max_depth or 64, MAX_PLY - 1)
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.stop_event = stop_event  # Set by another process or thread to end the search
+        self.first_depth = first_depth
+        self.on_iteration = on_iteration
+        self.tablebase = tablebase
+        self.nodes = 0
+        self.qnodes = 0  # Nodes searched in quiescence, also counted in nodes
+        self.tt_hits = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.stats = stats
+        # Move generation, evaluation and check detection go through these,
+        # so statistics can time them without slowing down other searches
+        self._generate = generate_moves_into
+        self._is_legal = is_legal
+        self._evaluate = evaluate
+        self._in_check = GameState.in_check
+        if stats is not None:
+            for name, timer in (('_generate', 'movegen'), ('_is_legal', 'movegen'), ('_evaluate', 'eval'),
+                                ('_in_check', 'check')):
+                setattr(self, name, stats.timed(timer, getattr(self, name)))
+        # Moves inside the tree are packed (see core.encode_move) and generated
+        # into one reused buffer per ply
+        self.buffers = [new_move_buffer() for _ in range(MAX_PLY)]
+        self.killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_PLY)]  # Quiet moves that cut off, per ply
+        self.history = {True: [0] * 4096, False: [0] * 4096}  # Cutoff credit per side and from-to squares
+        self.best_code = NO_MOVE
+        self.best_score = 0
+        self.completed_depth = 0
+        self.iteration_nodes = []  # Nodes searched by the end of each completed depth
+        self.stopped = False
+        self.start_time = None
+
+    @property
+    def best_move(self):
+        """Best move found so far as ((row, col), (row, col), promotion), or None"""
+        return decode_move(self.best_code)
+
+    def stop(self):
+        """Ask a running search to return as soon as possible"""
+        self.stopped = True
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def _check_limits(self):
+        if self.stop_event is not None and self.stop_event.is_set():
+            self.stopped = True
+        if self.stopped:
+            raise SearchStopped
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stopped = True
+            raise SearchStopped
+        if self.time_limit is not None and self.elapsed() >= self.time_limit:
+            self.stopped = True
+            raise SearchStopped
+
+    def run(self):
+        """Search deeper and deeper until a limit is hit, then return the best move"""
+        state = self.state
+        self.start_time = time.perf_counter()
+        buffer = self.buffers[0]
+        if not self._generate(state, buffer):
+            return None
+        self.best_code = buffer[0]
+        root_ply = len(state.undo_stack)
+
+        score = 0
+        for depth in range(self.first_depth, self.max_depth + 1):
+            try:
+                if depth >= 4 and self.completed_depth:
+                    score = self._aspiration(depth, score)
+                else:
+                    score = self._search_root(depth, -INFINITY, INFINITY)
+            except SearchStopped:
+                # Unwind the moves the interrupted iteration left on the board
+                while len(state.undo_stack) > root_ply:
+                    state.unmake_move()
+                break
+            self.completed_depth = depth
+            self.best_score = score
+            self.iteration_nodes.append(self.nodes)
+            if self.on_iteration is not None:
+                self.on_iteration(self)
+
+            # A new iteration takes several times longer than the last one
+            if self.time_limit is not None and self.elapsed() > self.time_limit / 2:
+                break
+            if abs(score) > MATE_BOUND:
+                break
+        if self.stats is not None:
+            self.stats.add(self)
+        return self.best_move
+
+    def principal_variation(self):
+        """Follow hash moves from the root to get the expected line of play"""
+        state = self.state
+        line = []
+        move = self.best_code
+        seen = set()
+        while move != NO_MOVE and state.hash not in seen and len(line) < self.completed_depth:
+            if not is_legal(state, move):
+                break
+            seen.add(state.hash)
+            line.append(decode_move(move))
+            state.make_move(move)
+            entry = self.tt.probe(state.hash)
+            move = entry[0] if entry is not None else NO_MOVE
+        for _ in line:
+            state.unmake_move()
+        return line
+
+    def _aspiration(self, depth, previous):
+        """Search a narrow window around the last score, widening on failure"""
+        delta = ASPIRATION_WINDOW
+        alpha, beta = previous - delta, previous + delta
+        while True:
+            score = self._search_root(depth, alpha, beta)
+            if score <= alpha:
+                alpha = max(score - delta, -INFINITY)
+            elif score >= beta:
+                beta = min(score + delta, INFINITY)
+            else:
+                return score
+            delta *= 2
+
+    def _search_root(self, depth, alpha, beta):
+        state = self.state
+        buffer = self.buffers[0]
+        moves = self._order_moves(buffer[:self._generate(state, buffer)], self.best_code)
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = NO_MOVE
+        for index, move in enumerate(moves):
+            state.make_move(move)
+            if index == 0:
+                score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            else:
+                score = -self._negamax(depth - 1, -alpha - 1, -alpha, 1)
+                if alpha < score < beta:
+                    score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            state.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    # Anything that beats the previous best move is safe to keep,
+                    # even if this iteration gets cut short
+                    self.best_code = move
+                    if score >= beta:
+                        break
+        if best_score >= beta:
+            bound = LOWER_BOUND
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+        self.tt.store(state.hash, best_move, best_score, bound, depth)
+        return best_score
+
+    def _negamax(self, depth, alpha, beta, ply):
+        state = self.state
+        self.nodes += 1
+        if self.nodes & 255 == 0:
+            self._check_limits()
+
+        if state.halfmove_clock >= 100 or state.is_repetition():
+            return 0
+
+        if self.tablebase is not None:
+            result = self.tablebase.probe(state)
+            if result is not None:
+                outcome, plies = result
+                return outcome * (MATE - ply - plies)
+
+        if depth <= 0:
+            return self._quiesce(alpha, beta, ply)
+
+        original_alpha = alpha
+        tt_move = NO_MOVE
+        entry = self.tt.probe(state.hash)
+        if entry is not None:
+            self.tt_hits += 1
+            tt_move, tt_score, bound, tt_depth = entry
+            tt_score = _from_tt_score(tt_score, ply)
+            # Only trust stored bounds at null-window nodes so the PV stays intact
+            if tt_depth >= depth and beta - alpha == 1:
+                if (bound == EXACT
+                        or (bound == LOWER_BOUND and tt_score >= beta)
+                        or (bound == UPPER_BOUND and tt_score <= alpha)):
+                    return tt_score
+
+        board = state.chess_board
+        best_score = -INFINITY
+        best_move = NO_MOVE
+        index = -1
+        for index, move in enumerate(self._staged_moves(tt_move, ply)):
+            # Promotions and en passant are flagged 1 and 2, castling 3 is quiet
+            flag = move >> 14
+            end_row, end_col = SQUARES[move >> 6 & 63]
+            quiet = flag != 1 and flag != 2 and board[end_row][end_col] == ' '
+            state.make_move(move)
+            if index == 0:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # Principal variation search: prove the rest worse with a null window
+                score = -self._negamax(depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            state.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if index == 0:
+                            self.first_move_cutoffs += 1
+                        if quiet:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1], killers[0] = killers[0], move
+                            self.history[state.white_to_play][move & 4095] += depth * depth
+                        break
+
+        if index < 0:
+            # No legal moves
+            return -MATE + ply if self._in_check(state) else 0
+
+        if best_score >= beta:
+            bound = LOWER_BOUND
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+        self.tt.store(state.hash, best_move, _to_tt_score(best_score, ply), bound, depth)
+        return best_score
+
+    def _quiesce(self, alpha, beta, ply):
+        """Search captures until the position is quiet, so leaf scores don't miss hanging pieces
+
+        The side to move can stand pat on the static evaluation unless in
+        check, where every evasion is searched instead. Captures that lose
+        material by static exchange, or that can't lift the score to alpha
+        even with DELTA_MARGIN on top, are skipped.
+        """
+        state = self.state
+        self.nodes += 1
+        self.qnodes += 1
+        if self.nodes & 255 == 0:
+            self._check_limits()
+
+        # Out of buffers: the static evaluation has to do, check or not
+        if ply >= MAX_PLY - 1:
+            return self._evaluate(state)
+        buffer = self.buffers[ply]
+        in_check = self._in_check(state)
+        if in_check:
+            end = self._generate(state, buffer)
+            if not end:
+                return -MATE + ply
+            stand_pat = best_score = -INFINITY
+        else:
+            stand_pat = best_score = self._evaluate(state)
+            if stand_pat >= beta:
+                return stand_pat
+            # Delta pruning: not even taking a queen with a promotion would reach alpha
+            if stand_pat + 2 * PIECE_VALUES['q'] - PIECE_VALUES['p'] + DELTA_MARGIN < alpha:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            end = self._generate(state, buffer, 0, True, False)
+
+        board = state.chess_board
+        for move in sorted(buffer[:end], key=lambda move: self._capture_order(board, move)):
+            if not in_check:
+                gain = see(state, move)
+                if gain < 0 or stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
+            state.make_move(move)
+            score = -self._quiesce(-beta, -alpha, ply + 1)
+            state.unmake_move()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def _staged_moves(self, tt_move, ply):
+        """Yield moves best first: hash move, captures by MVV-LVA, killers, then quiets by history
+
+        Each stage is only generated once the moves before it failed to cut
+        off, so most nodes never generate their quiet moves.
+        """
+        state = self.state
+        if tt_move != NO_MOVE and self._is_legal(state, tt_move):
+            yield tt_move
+
+        # Captures fill the front of this ply's buffer and quiets go after them
+        buffer = self.buffers[ply]
+        board = state.chess_board
+        end = self._generate(state, buffer, 0, True, False)
+        captures = sorted(buffer[:end], key=lambda move: self._capture_order(board, move))
+        for move in captures:
+            if move != tt_move:
+                yield move
+
+        killers = [killer for killer in self.killers[ply]
+                   if killer != NO_MOVE and killer != tt_move and killer not in captures and self._is_legal(state, killer)]
+        yield from killers
+
+        history = self.history[state.white_to_play]
+        quiets = sorted(buffer[end:self._generate(state, buffer, end, False, True)],
+                        key=lambda move: -history[move & 4095])
+        for move in quiets:
+            if move != tt_move and move not in killers:
+                yield move
+
+    @staticmethod
+    def _capture_order(board, move):
+        """Most valuable victim first, least valuable attacker breaking ties"""
+        end_row, end_col = SQUARES[move >> 6 & 63]
+        target = board[end_row][end_col]
+        score = 0
+        if target != ' ':
+            start_row, start_col = SQUARES[move & 63]
+            score -= 10 * PIECE_VALUES[target.lower()] - PIECE_VALUES[board[start_row][start_col].lower()]
+        if move >> 14 == 1:
+            score -= PROMOTION_VALUES[move >> 12 & 3]
+        return score
+
+    def _order_moves(self, moves, first_move):
+        """Root ordering: previous best move first, then captures of the most valuable pieces"""
+        board = self.state.chess_board
+        return sorted(moves, key=lambda move: -INFINITY if move == first_move else self._capture_order(board, move))
+
+
+
+
+def _helper_search(state, tt_name, tt_mb, worker_id, time_limit, max_depth, stop_event, results, tablebase_dir):
+    """Lazy SMP helper: search the same root and share what it finds through the table"""
+    tt = SharedTranspositionTable(tt_mb, name=tt_name)
+    tablebase = None
+    if tablebase_dir is not None:
+        from tablebase import Tablebases
+        tablebase = Tablebases(tablebase_dir)
+    # Odd helpers skip a depth so the workers don't all search in lockstep
+    search = Search(state, time_limit, None, max_depth, tt, stop_event, first_depth=1 + worker_id % 2,
+                    tablebase=tablebase)
+    search.run()
+    results.put((worker_id, search.completed_depth, search.best_code, search.best_score, search.nodes,
+                 search.qnodes))
+    tt.close()
+    if tablebase is not None:
+        tablebase.close()
+
+
+def parallel_search(state, workers, time_limit=None, node_limit=None, max_depth=None, tt=None, tt_mb=16,
+                    stop_event=None, on_iteration=None, tablebase=None, stats=None):
+    """Lazy SMP: run workers processes on the same position with a shared table
+
+    The calling process searches too and decides when everyone stops, either
+    at its own limits or when stop_event, a multiprocessing.Event, is set. The
+    returned Search holds the deepest completed iteration of any worker and
+    the node count summed over all of them. stats only sees the calling
+    process's own search.
+    """
+    own_tt = not isinstance(tt, SharedTranspositionTable)
+    if own_tt:
+        tt = SharedTranspositionTable(tt_mb)
+    if stop_event is None:
+        stop_event = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    helpers = [multiprocessing.Process(target=_helper_search,
+                                       args=(state, tt.name, tt.size_mb, worker_id, time_limit, max_depth,
+                                             stop_event, results, tablebase and tablebase.directory),
+                                       daemon=True)
+               for worker_id in range(1, workers)]
+    for helper in helpers:
+        helper.start()
+
+    main = Search(state, time_limit, node_limit, max_depth, tt, stop_event, on_iteration=on_iteration,
+                  tablebase=tablebase, stats=stats)
+    main.run()
+    stop_event.set()
+
+    for _ in helpers:
+        try:
+            worker_id, depth, best_code, score, nodes, qnodes = results.get(timeout=5)
+        except queue.Empty:
+            break
+        main.nodes += nodes
+        main.qnodes += qnodes
+        if depth > main.completed_depth and best_code != NO_MOVE:
+            main.completed_depth, main.best_code, main.best_score = depth, best_code, score
+    for helper in helpers:
+        helper.join(timeout=1)
+
+    if own_tt:
+        tt.close()
+        tt.unlink()
+    return main
+
+
+def find_best_move(state, time_limit=None, node_limit=None, max_depth=None, tt=None, workers=1, book=None,
+                   tablebase=None):
+    """Search the position and return the best move found within the limits
+
+    With a book (see book.PolyglotBook), book moves are played without searching.
+    """
+    if book is not None:
+        move = book.choose(state)
+        if move is not None:
+            return move
+    if workers > 1:
+        return parallel_search(state, workers, time_limit, node_limit, max_depth, tt, tablebase=tablebase).best_move
+    return Search(state, time_limit, node_limit, max_depth, tt, tablebase=tablebase).run()
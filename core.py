@@ -0,0 +1,1066 @@
+import random
+from array import array
+
+from attacks import (
+    BISHOP_RAYS, KING_TARGETS, KNIGHT_TARGETS, PAWN_SOURCES, QUEEN_RAYS, ROOK_RAYS,
+)
+from evaluation import EG_TABLE, MG_TABLE, MG_VALUES, PHASE_WEIGHTS, material_and_pst
+
+class Piece:
+    def __init__(self, notation, value=None):
+        self.notation = notation
+        # Defaults to the middlegame material value used by the evaluation
+        self.value = MG_VALUES[notation.lower()] if value is None else value
+
+def get_square_notation(row, col):
+    """Convert board coordinates to chess notation"""
+    files = 'abcdefgh'
+    ranks = '87654321'
+    return files[col] + ranks[row]
+
+def get_piece_notation(piece):
+    """Convert piece to chess notation"""
+    piece_map = {
+        'P': '', 'p': '',
+        'R': 'R', 'r': 'R',
+        'N': 'N', 'n': 'N',
+        'B': 'B', 'b': 'B',
+        'Q': 'Q', 'q': 'Q',
+        'K': 'K', 'k': 'K'
+    }
+    return piece_map.get(piece, '')
+
+# Castling rights bit flags
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+# Rights lost when a piece moves from or to one of these squares
+CASTLING_LOSS = {
+    (7, 4): WHITE_KINGSIDE | WHITE_QUEENSIDE,
+    (7, 7): WHITE_KINGSIDE,
+    (7, 0): WHITE_QUEENSIDE,
+    (0, 4): BLACK_KINGSIDE | BLACK_QUEENSIDE,
+    (0, 7): BLACK_KINGSIDE,
+    (0, 0): BLACK_QUEENSIDE,
+}
+
+# Zobrist keys: one random 64-bit number per piece and square, castling
+# rights combination, en passant file and side to move
+_zobrist_random = random.Random(20250803)
+ZOBRIST_PIECES = {piece: [_zobrist_random.getrandbits(64) for _ in range(64)] for piece in 'PNBRQKpnbrqk'}
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
+UNDO_HASH = 5  # Position of the hash in an undo stack entry
+
+class GameState:
+    def __init__(self, backend='list'):
+        """backend is 'list' for a list-of-lists board or 'bitboard' for BitboardBoard"""
+        self.backend = backend
+        board = [
+            "rnbqkbnr",
+            "pppppppp",
+            "        ",
+            "        ",
+            "        ",
+            "        ",
+            "PPPPPPPP",
+            "RNBQKBNR"
+        ]
+        self.chess_board = self.new_board(board)
+        self.white_to_play = True
+        self.castling_rights = WHITE_KINGSIDE | WHITE_QUEENSIDE | BLACK_KINGSIDE | BLACK_QUEENSIDE
+        self.en_passant = None  # Square a pawn can capture onto en passant
+        self.halfmove_clock = 0  # Moves since the last capture or pawn move
+        self.undo_stack = []  # One entry per make_move, popped by unmake_move
+        self.move_history = []  # Moves played through add_move, in SAN
+        self.moves = array('H')  # The same moves packed, see encode_move
+        self.move_number = 1  # Full move number as in FEN, goes up after each black move
+        self.hash = self.compute_hash()  # Zobrist key, updated incrementally by make_move
+        self.king_squares = self.locate_kings()  # Kept up to date by make_move and unmake_move
+        # Material and piece-square scores from white's side, updated incrementally
+        self.mg_score, self.eg_score, self.phase = material_and_pst(self.chess_board)
+
+    def new_board(self, rows):
+        """Build a board for the configured backend from rows of piece characters"""
+        if self.backend == 'bitboard':
+            # Imported here so the lookup tables are only built when used
+            from bitboard import BitboardBoard
+            return BitboardBoard(rows)
+        return [list(row) for row in rows]
+
+    def compute_hash(self):
+        """Zobrist key of the position computed from scratch"""
+        key = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.chess_board[row][col]
+                if piece != ' ':
+                    key ^= ZOBRIST_PIECES[piece][row * 8 + col]
+        key ^= ZOBRIST_CASTLING[self.castling_rights]
+        if self.en_passant is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant[1]]
+        if not self.white_to_play:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key
+
+    def locate_kings(self):
+        """Find both kings on the board, keyed by 'K' and 'k'"""
+        king_squares = {}
+        for row in range(8):
+            for col in range(8):
+                if self.chess_board[row][col] in 'Kk':
+                    king_squares[self.chess_board[row][col]] = (row, col)
+        return king_squares
+
+    def is_repetition(self):
+        """Check if the current position occurred before since the last capture or pawn move"""
+        # Positions with the same side to move are two plies apart
+        for entry in self.undo_stack[-2:-self.halfmove_clock - 1:-2]:
+            if entry[UNDO_HASH] == self.hash:
+                return True
+        return False
+
+    def legal_moves(self):
+        """Legal moves for the side to move"""
+        return generate_legal_moves(self)
+
+    def legal_captures(self):
+        """Captures, en passant and promotions for the side to move"""
+        return generate_captures(self)
+
+    def legal_quiets(self):
+        """Moves for the side to move that capture nothing and don't promote"""
+        return generate_quiets(self)
+
+    def is_legal(self, move):
+        return is_legal(self, move)
+
+    def in_check(self):
+        """Check if the side to move is in check"""
+        king_row, king_col = self.king_squares['K' if self.white_to_play else 'k']
+        return _is_attacked(self.chess_board, king_row, king_col, not self.white_to_play)
+
+    def getBoard(self):
+        return self.chess_board
+    
+    def change_turn(self):
+        self.white_to_play = not self.white_to_play
+
+    def make_move(self, move):
+        """Play a legal move, packed or as a tuple, and pass the turn"""
+        if move.__class__ is int:
+            start, end = move & 63, move >> 6 & 63
+            (start_row, start_col), (end_row, end_col) = SQUARES[start], SQUARES[end]
+            promotion = None
+            if move >> 14 == 1:
+                promotion = PROMOTION_ORDER[move >> 12 & 3]
+                if not self.white_to_play:
+                    promotion = promotion.lower()
+        else:
+            (start_row, start_col), (end_row, end_col), promotion = move
+            start, end = start_row * 8 + start_col, end_row * 8 + end_col
+        board = self.chess_board
+        piece = board[start_row][start_col]
+        pieces = ZOBRIST_PIECES
+
+        # En passant removes the pawn beside the start square
+        if piece in 'Pp' and (end_row, end_col) == self.en_passant:
+            captured = board[start_row][end_col]
+            board[start_row][end_col] = ' '
+            captured_square = start_row * 8 + end_col
+        else:
+            captured = board[end_row][end_col]
+            captured_square = end
+
+        # Everything unmake_move can't recompute goes on the undo stack
+        self.undo_stack.append((move, captured, self.castling_rights, self.en_passant, self.halfmove_clock, self.hash,
+                                self.mg_score, self.eg_score, self.phase))
+
+        moved = promotion or piece
+        key = self.hash ^ pieces[piece][start] ^ pieces[moved][end]
+        mg = self.mg_score - MG_TABLE[piece][start] + MG_TABLE[moved][end]
+        eg = self.eg_score - EG_TABLE[piece][start] + EG_TABLE[moved][end]
+        if promotion:
+            self.phase += PHASE_WEIGHTS[promotion]
+        if captured != ' ':
+            key ^= pieces[captured][captured_square]
+            mg -= MG_TABLE[captured][captured_square]
+            eg -= EG_TABLE[captured][captured_square]
+            self.phase -= PHASE_WEIGHTS[captured]
+
+        if piece in 'Kk':
+            self.king_squares[piece] = (end_row, end_col)
+
+        # Castling also moves the rook
+        if piece in 'Kk' and abs(end_col - start_col) == 2:
+            rook_col, rook_end_col = (7, 5) if end_col == 6 else (0, 3)
+            rook = board[start_row][rook_col]
+            board[start_row][rook_end_col] = rook
+            board[start_row][rook_col] = ' '
+            rook_start, rook_end = start_row * 8 + rook_col, start_row * 8 + rook_end_col
+            key ^= pieces[rook][rook_start] ^ pieces[rook][rook_end]
+            mg += MG_TABLE[rook][rook_end] - MG_TABLE[rook][rook_start]
+            eg += EG_TABLE[rook][rook_end] - EG_TABLE[rook][rook_start]
+
+        board[end_row][end_col] = moved
+        board[start_row][start_col] = ' '
+        self.mg_score = mg
+        self.eg_score = eg
+
+        key ^= ZOBRIST_CASTLING[self.castling_rights]
+        self.castling_rights &= ~(CASTLING_LOSS.get((start_row, start_col), 0) | CASTLING_LOSS.get((end_row, end_col), 0))
+        key ^= ZOBRIST_CASTLING[self.castling_rights]
+
+        if self.en_passant is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant[1]]
+        # Only record en passant when an enemy pawn can actually take, so
+        # otherwise identical positions hash the same
+        enemy_pawn = 'p' if piece == 'P' else 'P'
+        if (piece in 'Pp' and abs(end_row - start_row) == 2
+                and ((end_col > 0 and board[end_row][end_col - 1] == enemy_pawn)
+                     or (end_col < 7 and board[end_row][end_col + 1] == enemy_pawn))):
+            self.en_passant = ((start_row + end_row) // 2, start_col)
+            key ^= ZOBRIST_EN_PASSANT[start_col]
+        else:
+            self.en_passant = None
+
+        if piece in 'Pp' or captured != ' ':
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        self.hash = key ^ ZOBRIST_BLACK_TO_MOVE
+        if not self.white_to_play:
+            self.move_number += 1
+        self.change_turn()
+
+    def unmake_move(self):
+        """Take back the last move played with make_move"""
+        (move, captured, self.castling_rights, self.en_passant, self.halfmove_clock, self.hash,
+         self.mg_score, self.eg_score, self.phase) = self.undo_stack.pop()
+        if move.__class__ is int:
+            (start_row, start_col), (end_row, end_col) = SQUARES[move & 63], SQUARES[move >> 6 & 63]
+            promotion = move >> 14 == 1
+        else:
+            (start_row, start_col), (end_row, end_col), promotion = move
+        self.change_turn()
+        if not self.white_to_play:
+            self.move_number -= 1
+        board = self.chess_board
+        piece = board[end_row][end_col]
+        if promotion:
+            piece = 'P' if self.white_to_play else 'p'
+
+        board[start_row][start_col] = piece
+        if piece in 'Pp' and (end_row, end_col) == self.en_passant:
+            board[end_row][end_col] = ' '
+            board[start_row][end_col] = captured
+        else:
+            board[end_row][end_col] = captured
+
+        if piece in 'Kk':
+            self.king_squares[piece] = (start_row, start_col)
+        if piece in 'Kk' and abs(end_col - start_col) == 2:
+            rook_col, rook_end_col = (7, 5) if end_col == 6 else (0, 3)
+            board[start_row][rook_col] = board[start_row][rook_end_col]
+            board[start_row][rook_end_col] = ' '
+
+    def take_back(self):
+        """Unmake the last move and drop it from the move history"""
+        if not self.undo_stack:
+            return False
+        self.unmake_move()
+        if self.move_history:
+            self.move_history.pop()
+            self.moves.pop()
+        return True
+
+    def add_move(self, move):
+        """Record a move, packed or as a tuple, in the history, call before playing it"""
+        code = encode_move(self, move)
+        self.moves.append(code)
+        self.move_history.append(move_to_san(self, code))
+
+    def reset_board(self):
+        board = [
+                    "rnbqkbnr",
+                    "pppppppp",
+                    "        ",
+                    "        ",
+                    "        ",
+                    "        ",
+                    "PPPPPPPP",
+                    "RNBQKBNR"
+                ]
+        self.chess_board = self.new_board(board)
+        self.white_to_play = True
+        self.castling_rights = WHITE_KINGSIDE | WHITE_QUEENSIDE | BLACK_KINGSIDE | BLACK_QUEENSIDE
+        self.en_passant = None
+        self.halfmove_clock = 0
+        self.undo_stack = []
+        self.move_history = []
+        self.moves = array('H')
+        self.move_number = 1
+        self.hash = self.compute_hash()
+        self.king_squares = self.locate_kings()
+        self.mg_score, self.eg_score, self.phase = material_and_pst(self.chess_board)
+
+    def load_fen(self, fen):
+        """Set up the position described by a FEN string"""
+        fields = fen.split()
+        placement, side = fields[0], fields[1] if len(fields) > 1 else 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        en_passant = fields[3] if len(fields) > 3 else '-'
+
+        rows = []
+        for fen_row in placement.split('/'):
+            row = ''
+            for char in fen_row:
+                row += ' ' * int(char) if char.isdigit() else char
+            rows.append(row)
+        if len(rows) != 8 or any(len(row) != 8 for row in rows):
+            raise ValueError(f"Invalid FEN placement: {placement}")
+
+        self.chess_board = self.new_board(rows)
+        self.white_to_play = side == 'w'
+        self.castling_rights = 0
+        for char, right in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE), ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE)):
+            if char in castling:
+                self.castling_rights |= right
+
+        # Like make_move, only keep en passant squares a pawn can capture onto
+        self.en_passant = None
+        if en_passant != '-':
+            row, col = '87654321'.index(en_passant[1]), 'abcdefgh'.index(en_passant[0])
+            pawn_row, pawn = (row + 1, 'P') if self.white_to_play else (row - 1, 'p')
+            if any(0 <= c < 8 and self.chess_board[pawn_row][c] == pawn for c in (col - 1, col + 1)):
+                self.en_passant = (row, col)
+
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.move_number = int(fields[5]) if len(fields) > 5 else 1
+        self.undo_stack = []
+        self.move_history = []
+        self.moves = array('H')
+        self.hash = self.compute_hash()
+        self.king_squares = self.locate_kings()
+        self.mg_score, self.eg_score, self.phase = material_and_pst(self.chess_board)
+
+    def to_fen(self):
+        """FEN string of the current position"""
+        placement = []
+        for row in range(8):
+            fen_row = ''
+            empty = 0
+            for col in range(8):
+                piece = self.chess_board[row][col]
+                if piece == ' ':
+                    empty += 1
+                    continue
+                if empty:
+                    fen_row += str(empty)
+                    empty = 0
+                fen_row += piece
+            placement.append(fen_row + (str(empty) if empty else ''))
+
+        castling = ''.join(char for char, right in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE),
+                                                    ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+                           if self.castling_rights & right) or '-'
+        en_passant = get_square_notation(*self.en_passant) if self.en_passant is not None else '-'
+        side = 'w' if self.white_to_play else 'b'
+        return f"{'/'.join(placement)} {side} {castling} {en_passant} {self.halfmove_clock} {self.move_number}"
+
+
+def is_valid_move(piece, board, start_pos, end_pos):
+    if piece.lower() == "p":
+        return is_valid_pawn_move(board, start_pos, end_pos)
+    elif piece.lower() == "b":
+        return is_valid_bishop_move(board, start_pos, end_pos)
+    elif piece.lower() == "r":
+        return is_valid_rook_move(board, start_pos, end_pos)
+    elif piece.lower() == "n":
+        return is_valid_knight_move(board, start_pos, end_pos)
+    elif piece.lower() == "q":
+        return is_valid_queen_move(board, start_pos, end_pos)
+    elif piece.lower() == "k":
+        return is_valid_king_move(board, start_pos, end_pos)
+    
+
+def is_valid_bishop_move(board, start_pos, end_pos):
+    start_row, start_col = start_pos
+    end_row, end_col = end_pos
+
+    # Check if the start and end positions are on the same diagonal
+    if abs(start_row - end_row) != abs(start_col - end_col):
+        return False
+
+    # Check if the bishop's path is clear (no pieces in between)
+    row_dir = 1 if end_row > start_row else -1
+    col_dir = 1 if end_col > start_col else -1
+    check_row, check_col = start_row + row_dir, start_col + col_dir
+    while check_row != end_row and check_col != end_col:
+        if board[check_row][check_col] != ' ':
+            return False
+        check_row += row_dir
+        check_col += col_dir
+
+    if board[end_row][end_col] == ' ' or board[end_row][end_col].islower() != board[start_row][start_col].islower():
+            return True
+    return False
+
+def is_valid_rook_move(board, start_pos, end_pos):
+    start_row, start_col = start_pos
+    end_row, end_col = end_pos
+
+    # Check if the start and end positions are in the same row or column
+    if start_row != end_row and start_col != end_col:
+        return False
+
+    # Check if the rook's path is clear (no pieces in between)
+    if start_row == end_row:
+        # Moving horizontally
+        step = 1 if end_col > start_col else -1
+        for col in range(start_col + step, end_col, step):
+            if board[start_row][col] != ' ':
+                return False
+    else:
+        # Moving vertically
+        step = 1 if end_row > start_row else -1
+        for row in range(start_row + step, end_row, step):
+            if board[row][start_col] != ' ':
+                return False
+
+
+    if board[end_row][end_col] == ' ' or board[end_row][end_col].islower() != board[start_row][start_col].islower():
+            return True
+    return False
+
+
+def is_valid_knight_move(board, start_pos, end_pos):
+    start_row, start_col = start_pos
+    end_row, end_col = end_pos
+
+    # Check if the move is in an L-shape pattern (2 squares in one direction, 1 square perpendicular)
+    row_move = abs(start_row - end_row)
+    col_move = abs(start_col - end_col)
+
+    if (row_move == 2 and col_move == 1) or (row_move == 1 and col_move == 2):
+        # Check if the end position is within the board bounds
+        if end_row < 0 or end_row > 7 or end_col < 0 or end_col > 7:
+            return False
+
+        # Check if the end position is empty or has an opponent's piece
+        if board[end_row][end_col] == ' ' or board[end_row][end_col].islower() != board[start_row][start_col].islower():
+            return True
+
+    return False
+
+
+def is_valid_pawn_move(board, start_pos, end_pos):
+    start_row, start_col = start_pos
+    end_row, end_col = end_pos
+
+    # Check if the end position is within the board's bounds
+    if end_row < 0 or end_row > 7 or end_col < 0 or end_col > 7:
+        return False
+
+    # # Check if the end position is empty
+    # if board[end_row][end_col] != ' ':
+    #     return False
+
+    # White pawn moves
+    if board[start_row][start_col] == 'P':
+        if start_col == end_col and end_row == start_row - 1 and board[end_row][end_col] == ' ':
+            return True
+        elif start_row == 6 and start_col == end_col and end_row == start_row - 2 and board[start_row - 1][start_col] == ' ':
+            return True
+        elif abs(start_col - end_col) == 1 and end_row == start_row - 1 and board[end_row][end_col].islower():
+            return True
+
+    # Black pawn moves
+    elif board[start_row][start_col] == 'p':
+        if start_col == end_col and end_row == start_row + 1 and board[end_row][end_col] == ' ':
+            return True
+        elif start_row == 1 and start_col == end_col and end_row == start_row + 2 and board[start_row + 1][start_col] == ' ':
+            return True
+        
+        elif abs(start_col - end_col) == 1 and end_row == start_row + 1 and board[end_row][end_col].isupper():
+            return True
+
+    return False
+
+def is_valid_queen_move(board, start_pos, end_pos):
+    start_row, start_col = start_pos
+    end_row, end_col = end_pos
+
+    # Check if it's a valid rook move (vertical or horizontal)
+    if start_row == end_row or start_col == end_col:
+        return is_valid_rook_move(board, start_pos, end_pos)
+
+    # Check if it's a valid bishop move (diagonal)
+    row_move = abs(start_row - end_row)
+    col_move = abs(start_col - end_col)
+    if row_move == col_move:
+        return is_valid_bishop_move(board, start_pos, end_pos)
+
+    return False
+
+def is_valid_king_move(board, start_pos, end_pos):
+    start_row, start_col = start_pos
+    end_row, end_col = end_pos
+
+    # Check if the move is within one square in any direction
+    row_move = abs(start_row - end_row)
+    col_move = abs(start_col - end_col)
+
+    if row_move <= 1 and col_move <= 1:
+        # Check if the end position is within the board bounds
+        if end_row < 0 or end_row > 7 or end_col < 0 or end_col > 7:
+            return False
+
+        # Check if the end position is either empty or has an opponent's piece
+        if board[end_row][end_col] == ' ' or board[end_row][end_col].islower() != board[start_row][start_col].islower():
+            return True
+
+    return False
+
+
+PROMOTION_PIECES = 'QRBN'
+
+# Moves are packed into 16 bits: start square (row * 8 + col) in bits 0-5,
+# end square in bits 6-11, the promotion piece's index in PROMOTION_ORDER in
+# bits 12-13 and a flag in bits 14-15
+PROMOTION_ORDER = 'NBRQ'
+FLAG_PROMOTION = 1 << 14
+FLAG_EN_PASSANT = 2 << 14
+FLAG_CASTLING = 3 << 14
+NO_MOVE = 0  # Start and end squares can't be the same, so no move packs to 0
+MAX_MOVES = 256  # Room a move buffer needs for one position
+# Promotion bits in the order the generator tries them, queen first
+PROMOTION_BITS = tuple(FLAG_PROMOTION | PROMOTION_ORDER.index(piece) << 12 for piece in PROMOTION_PIECES)
+SQUARES = tuple((square >> 3, square & 7) for square in range(64))
+
+def encode_move(state, move):
+    """Pack a ((row, col), (row, col), promotion) move that is legal in state into 16 bits
+
+    The flags come from the board, so this has to be called before the move
+    is played. Moves that are already packed are returned as they are.
+    """
+    if move.__class__ is int:
+        return move
+    (start_row, start_col), (end_row, end_col), promotion = move
+    code = start_row * 8 + start_col | (end_row * 8 + end_col) << 6
+    piece = state.chess_board[start_row][start_col]
+    if promotion:
+        code |= FLAG_PROMOTION | PROMOTION_ORDER.index(promotion.upper()) << 12
+    elif piece in 'Pp' and start_col != end_col and (end_row, end_col) == state.en_passant:
+        code |= FLAG_EN_PASSANT
+    elif piece in 'Kk' and abs(end_col - start_col) == 2:
+        code |= FLAG_CASTLING
+    return code
+
+def decode_move(code):
+    """The ((row, col), (row, col), promotion) move packed into code, or None for NO_MOVE"""
+    if code == NO_MOVE:
+        return None
+    end = code >> 6 & 63
+    promotion = None
+    if code >> 14 == 1:
+        promotion = PROMOTION_ORDER[code >> 12 & 3]
+        # Pawns promote on row 0 for white and row 7 for black
+        if end >= 8:
+            promotion = promotion.lower()
+    return SQUARES[code & 63], SQUARES[end], promotion
+
+def new_move_buffer(size=MAX_MOVES):
+    """A zeroed buffer for generate_moves_into, meant to be reused"""
+    return array('H', bytes(2 * size))
+
+# Pawn, knight, king, rook-like and bishop-like attackers for each side
+ATTACKERS = {
+    True: ('P', 'N', 'K', 'RQ', 'BQ'),
+    False: ('p', 'n', 'k', 'rq', 'bq'),
+}
+
+def _is_attacked(board, row, col, by_white):
+    """Check if a square is attacked by the given side, working outward from it"""
+    if board.__class__ is not list:
+        return board.is_attacked(row * 8 + col, by_white)
+
+    square = row * 8 + col
+    pawn, knight, king, straight, diagonal = ATTACKERS[by_white]
+    for r, c in PAWN_SOURCES[by_white][square]:
+        if board[r][c] == pawn:
+            return True
+    for r, c in KNIGHT_TARGETS[square]:
+        if board[r][c] == knight:
+            return True
+    for r, c in KING_TARGETS[square]:
+        if board[r][c] == king:
+            return True
+
+    # Sliders: walk each ray until the first piece
+    for rays, sliders in ((ROOK_RAYS[square], straight), (BISHOP_RAYS[square], diagonal)):
+        for ray in rays:
+            for r, c in ray:
+                piece = board[r][c]
+                if piece != ' ':
+                    if piece in sliders:
+                        return True
+                    break
+    return False
+
+def is_square_attacked(state, square, by_color):
+    """Check if the (row, col) square is attacked by 'w' or 'b'"""
+    return _is_attacked(state.chess_board, square[0], square[1], by_color == 'w')
+
+def is_king_in_check(board, king_pos, king_color):
+    """Check if the king on king_pos is attacked
+
+    king_color is the king's islower(), so True means the black king.
+    """
+    return _is_attacked(board, king_pos[0], king_pos[1], king_color)
+
+def _generate_castling_moves(state, white):
+    """Castling needs the rights, empty squares between and no attacked squares on the king's path"""
+    board = state.chess_board
+    moves = []
+    row, king = (7, 'K') if white else (0, 'k')
+    kingside, queenside = (WHITE_KINGSIDE, WHITE_QUEENSIDE) if white else (BLACK_KINGSIDE, BLACK_QUEENSIDE)
+    if board[row][4] != king or _is_attacked(board, row, 4, not white):
+        return moves
+    if (state.castling_rights & kingside and board[row][5] == ' ' and board[row][6] == ' '
+            and not _is_attacked(board, row, 5, not white) and not _is_attacked(board, row, 6, not white)):
+        moves.append(((row, 4), (row, 6), None))
+    if (state.castling_rights & queenside and board[row][3] == ' ' and board[row][2] == ' ' and board[row][1] == ' '
+            and not _is_attacked(board, row, 3, not white) and not _is_attacked(board, row, 2, not white)):
+        moves.append(((row, 4), (row, 2), None))
+    return moves
+
+def _is_safe(board, white, king_row, king_col, start_row, start_col, end_row, end_col, en_passant):
+    """Check a move doesn't leave the mover's king attacked by trying it on the board"""
+    piece = board[start_row][start_col]
+    captured = board[end_row][end_col]
+    board[end_row][end_col] = piece
+    board[start_row][start_col] = ' '
+    if en_passant:
+        passed_pawn = board[start_row][end_col]
+        board[start_row][end_col] = ' '
+
+    if piece in 'Kk':
+        king_row, king_col = end_row, end_col
+    safe = not _is_attacked(board, king_row, king_col, not white)
+
+    board[start_row][start_col] = piece
+    board[end_row][end_col] = captured
+    if en_passant:
+        board[start_row][end_col] = passed_pawn
+    return safe
+
+def generate_moves_into(state, buffer, start=0, captures=True, quiets=True):
+    """Write the packed legal moves of the side to move into buffer, returning where they end
+
+    The moves fill buffer[start:end] for the returned end, so a search can
+    keep one buffer per ply (see new_move_buffer) and generate without
+    building a tuple per move. buffer needs MAX_MOVES free entries after
+    start. captures includes promotions and en passant, quiets everything
+    else, castling included.
+    """
+    board = state.chess_board
+    white = state.white_to_play
+    en_passant = state.en_passant
+    en_passant = en_passant[0] * 8 + en_passant[1] if en_passant is not None else -1
+    if board.__class__ is not list:
+        return board.generate_moves(buffer, start, white, en_passant, state.castling_rights, captures, quiets)
+    step, first_row, last_row = (-1, 6, 0) if white else (1, 1, 7)
+    end = start
+
+    # Pseudo-legal moves first, walking each piece's rays and jump offsets
+    for row in range(8):
+        board_row = board[row]
+        for col in range(8):
+            piece = board_row[col]
+            if piece == ' ' or piece.isupper() != white:
+                continue
+            kind = piece.lower()
+            square = row * 8 + col
+
+            if kind == 'p':
+                r = row + step
+                ahead = square + step * 8
+                # Pushes are quiet unless they promote
+                if board[r][col] == ' ':
+                    if r == last_row:
+                        if captures:
+                            for bits in PROMOTION_BITS:
+                                buffer[end] = square | ahead << 6 | bits
+                                end += 1
+                    elif quiets:
+                        buffer[end] = square | ahead << 6
+                        end += 1
+                        if row == first_row and board[r + step][col] == ' ':
+                            buffer[end] = square | (ahead + step * 8) << 6
+                            end += 1
+                if captures:
+                    for c in (col - 1, col + 1):
+                        if 0 <= c < 8:
+                            target = board[r][c]
+                            to = r * 8 + c
+                            if target != ' ' and target.isupper() != white:
+                                if r == last_row:
+                                    for bits in PROMOTION_BITS:
+                                        buffer[end] = square | to << 6 | bits
+                                        end += 1
+                                else:
+                                    buffer[end] = square | to << 6
+                                    end += 1
+                            elif to == en_passant:
+                                buffer[end] = square | to << 6 | FLAG_EN_PASSANT
+                                end += 1
+
+            elif kind == 'n' or kind == 'k':
+                for r, c in (KNIGHT_TARGETS if kind == 'n' else KING_TARGETS)[square]:
+                    target = board[r][c]
+                    if quiets if target == ' ' else captures and target.isupper() != white:
+                        buffer[end] = square | (r * 8 + c) << 6
+                        end += 1
+
+            else:
+                rays = ROOK_RAYS if kind == 'r' else BISHOP_RAYS if kind == 'b' else QUEEN_RAYS
+                for ray in rays[square]:
+                    for r, c in ray:
+                        target = board[r][c]
+                        if target == ' ':
+                            if quiets:
+                                buffer[end] = square | (r * 8 + c) << 6
+                                end += 1
+                        else:
+                            if captures and target.isupper() != white:
+                                buffer[end] = square | (r * 8 + c) << 6
+                                end += 1
+                            break
+
+    # Then drop the ones that leave the king attacked, compacting in place.
+    # Out of check only king moves, en passant and moves of a piece on a
+    # line with the king can uncover it, so only those are tried on the board.
+    king_row, king_col = state.king_squares['K' if white else 'k']
+    in_check = _is_attacked(board, king_row, king_col, not white)
+    count = start
+    for index in range(start, end):
+        code = buffer[index]
+        start_row, start_col = SQUARES[code & 63]
+        en_passant = code >> 14 == 2
+        if (in_check or en_passant or start_row == king_row or start_col == king_col
+                or abs(start_row - king_row) == abs(start_col - king_col)):
+            end_row, end_col = SQUARES[code >> 6 & 63]
+            if not _is_safe(board, white, king_row, king_col, start_row, start_col, end_row, end_col, en_passant):
+                continue
+        buffer[count] = code
+        count += 1
+
+    if quiets and not in_check:
+        for (row, col), (_, end_col), _ in _generate_castling_moves(state, white):
+            buffer[count] = row * 8 + col | (row * 8 + end_col) << 6 | FLAG_CASTLING
+            count += 1
+    return count
+
+def _unpacked_moves(state, captures=True, quiets=True):
+    buffer = new_move_buffer()
+    end = generate_moves_into(state, buffer, 0, captures, quiets)
+    return [decode_move(code) for code in buffer[:end]]
+
+def generate_legal_moves(state, color=None):
+    """Find all fully legal moves for 'w' or 'b' (defaults to the side to move)
+
+    Moves are ((start_row, start_col), (end_row, end_col), promotion) where
+    promotion is the piece a pawn turns into, or None. Use
+    generate_moves_into for packed moves.
+    """
+    white = state.white_to_play if color is None else color == 'w'
+    if white == state.white_to_play:
+        return _unpacked_moves(state)
+    state.white_to_play = white
+    try:
+        return _unpacked_moves(state)
+    finally:
+        state.white_to_play = not white
+
+def generate_captures(state):
+    """Legal captures, en passant and promotions for the side to move"""
+    return _unpacked_moves(state, quiets=False)
+
+def generate_quiets(state):
+    """Legal moves that capture nothing and don't promote, castling included"""
+    return _unpacked_moves(state, captures=False)
+
+def is_pseudo_legal(state, move):
+    """Check a move from outside the generator, such as a hash or killer move, against the position
+
+    Built on the is_valid_* piece rules, plus the special pawn and king moves
+    they don't cover. Doesn't look at whether the king is left in check.
+    """
+    (start_row, start_col), (end_row, end_col), promotion = move
+    board = state.chess_board
+    white = state.white_to_play
+    piece = board[start_row][start_col]
+    if piece == ' ' or piece.isupper() != white:
+        return False
+    target = board[end_row][end_col]
+    if target != ' ' and (target.isupper() == white or target in 'Kk'):
+        return False
+    kind = piece.lower()
+
+    if kind == 'p':
+        step, start_rank, last_row = (-1, 6, 0) if white else (1, 1, 7)
+        if (promotion is not None) != (end_row == last_row):
+            return False
+        if promotion is not None and promotion.isupper() != white:
+            return False
+        if start_col == end_col:
+            if target != ' ':
+                return False
+            if end_row == start_row + step:
+                return True
+            return end_row == start_row + 2 * step and start_row == start_rank and board[start_row + step][start_col] == ' '
+        return (abs(end_col - start_col) == 1 and end_row == start_row + step
+                and (target != ' ' or (end_row, end_col) == state.en_passant))
+
+    if promotion is not None:
+        return False
+    if kind == 'k' and abs(end_col - start_col) == 2:
+        return move in _generate_castling_moves(state, white)
+    # Knights and kings by table lookup, cheaper than the validators
+    if kind == 'n':
+        return (end_row, end_col) in KNIGHT_TARGETS[start_row * 8 + start_col]
+    if kind == 'k':
+        return (end_row, end_col) in KING_TARGETS[start_row * 8 + start_col]
+    return bool(is_valid_move(piece, board, (start_row, start_col), (end_row, end_col)))
+
+def is_legal(state, move):
+    """Check a move from outside the generator, packed or not, is playable in the position"""
+    if move.__class__ is int:
+        code, move = move, decode_move(move)
+        # The flags have to agree with the board too
+        if move is None or not is_pseudo_legal(state, move) or encode_move(state, move) != code:
+            return False
+    elif not is_pseudo_legal(state, move):
+        return False
+    (start_row, start_col), (end_row, end_col), _ = move
+    board = state.chess_board
+    white = state.white_to_play
+    king_row, king_col = state.king_squares['K' if white else 'k']
+    en_passant = board[start_row][start_col] in 'Pp' and start_col != end_col and board[end_row][end_col] == ' '
+    return _is_safe(board, white, king_row, king_col, start_row, start_col, end_row, end_col, en_passant)
+
+# Piece values for exchanges; the king is worth more than anything it could win
+SEE_VALUES = {'p': 100, 'n': 320, 'b': 330, 'r': 500, 'q': 900, 'k': 20000}
+
+def _least_valuable_attacker(board, row, col, white, removed):
+    """The (square, kind) of the cheapest piece of a side attacking a square, or None
+
+    Squares in removed have already been used up in the exchange and count
+    as empty, so sliders behind them join in.
+    """
+    square = row * 8 + col
+    pawn, knight, king, straight, diagonal = ATTACKERS[white]
+    for r, c in PAWN_SOURCES[white][square]:
+        if board[r][c] == pawn and (r, c) not in removed:
+            return (r, c), 'p'
+    for r, c in KNIGHT_TARGETS[square]:
+        if board[r][c] == knight and (r, c) not in removed:
+            return (r, c), 'n'
+
+    sliders = {}
+    for rays, kinds in ((BISHOP_RAYS[square], diagonal), (ROOK_RAYS[square], straight)):
+        for ray in rays:
+            for r, c in ray:
+                piece = board[r][c]
+                if piece == ' ' or (r, c) in removed:
+                    continue
+                if piece in kinds:
+                    sliders.setdefault(piece.lower(), (r, c))
+                break
+    for kind in 'brq':
+        if kind in sliders:
+            return sliders[kind], kind
+
+    for r, c in KING_TARGETS[square]:
+        if board[r][c] == king and (r, c) not in removed:
+            return (r, c), 'k'
+    return None
+
+def see(state, move):
+    """Static exchange evaluation: material the side to move wins with a capture
+
+    Plays out every capture on the target square, cheapest attacker first,
+    with either side free to stop when going on would lose more. Pins are
+    ignored. Returns centipawns from the moving side's point of view, so a
+    negative value is a losing capture.
+    """
+    if move.__class__ is int:
+        move = decode_move(move)
+    (start_row, start_col), (end_row, end_col), promotion = move
+    board = state.chess_board
+    piece = board[start_row][start_col]
+    white = piece.isupper()
+    target = board[end_row][end_col]
+    removed = {(start_row, start_col)}
+
+    if target != ' ':
+        gain = SEE_VALUES[target.lower()]
+    elif piece in 'Pp' and (end_row, end_col) == state.en_passant:
+        gain = SEE_VALUES['p']
+        removed.add((start_row, end_col))
+    else:
+        gain = 0
+    on_square = SEE_VALUES[piece.lower()]
+    if promotion is not None:
+        gain += SEE_VALUES[promotion.lower()] - SEE_VALUES['p']
+        on_square = SEE_VALUES[promotion.lower()]
+
+    # gains[i] is what the side making capture i has won if the exchange stops there
+    gains = [gain]
+    side = not white
+    while True:
+        attacker = _least_valuable_attacker(board, end_row, end_col, side, removed)
+        if attacker is None:
+            break
+        square, kind = attacker
+        gains.append(on_square - gains[-1])
+        on_square = SEE_VALUES[kind]
+        removed.add(square)
+        side = not side
+
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
+
+def move_to_uci(move):
+    """Coordinate notation for a move, e.g. e2e4 or e7e8q"""
+    if move.__class__ is int:
+        move = decode_move(move)
+    (start_row, start_col), (end_row, end_col), promotion = move
+    text = get_square_notation(start_row, start_col) + get_square_notation(end_row, end_col)
+    return text + promotion.lower() if promotion else text
+
+def move_from_uci(state, text):
+    """The legal move in state written as text in coordinate notation, or None"""
+    for legal_move in generate_legal_moves(state):
+        if move_to_uci(legal_move) == text:
+            return legal_move
+    return None
+
+def move_to_san(state, move, legal_moves=None):
+    """Standard algebraic notation for a legal move in state, e.g. Nbd2, exd6 or e8=Q+"""
+    if move.__class__ is int:
+        move = decode_move(move)
+    (start_row, start_col), (end_row, end_col), promotion = move
+    board = state.chess_board
+    piece = board[start_row][start_col]
+    if piece in 'Kk' and abs(end_col - start_col) == 2:
+        text = 'O-O' if end_col == 6 else 'O-O-O'
+    else:
+        if legal_moves is None:
+            legal_moves = generate_legal_moves(state)
+        target = get_square_notation(end_row, end_col)
+        if piece in 'Pp':
+            # A pawn capture changes file, en passant included
+            text = 'abcdefgh'[start_col] + 'x' + target if start_col != end_col else target
+            if promotion:
+                text += '=' + promotion.upper()
+        else:
+            # Name the file, the rank or both when another piece of the same
+            # kind can also reach the target square
+            others = [start for start, end, _ in legal_moves
+                      if end == (end_row, end_col) and start != (start_row, start_col)
+                      and board[start[0]][start[1]] == piece]
+            disambiguation = ''
+            if others:
+                if all(col != start_col for _, col in others):
+                    disambiguation = 'abcdefgh'[start_col]
+                elif all(row != start_row for row, _ in others):
+                    disambiguation = '87654321'[start_row]
+                else:
+                    disambiguation = get_square_notation(start_row, start_col)
+            capture = 'x' if board[end_row][end_col] != ' ' else ''
+            text = get_piece_notation(piece) + disambiguation + capture + target
+
+    state.make_move(move)
+    if state.in_check():
+        text += '#' if not generate_legal_moves(state) else '+'
+    state.unmake_move()
+    return text
+
+def move_from_san(state, text):
+    """The legal move in state written as text in SAN, or None if there isn't exactly one"""
+    text = text.rstrip('+#!?')
+    legal_moves = generate_legal_moves(state)
+    board = state.chess_board
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        end_col = 6 if len(text) == 3 else 2
+        for legal_move in legal_moves:
+            (start_row, start_col), end, _ = legal_move
+            if board[start_row][start_col] in 'Kk' and start_col == 4 and end[1] == end_col:
+                return legal_move
+        return None
+
+    promotion = None
+    if '=' in text:
+        text, promotion = text.split('=')
+    elif text[-1] in 'QRBN' and text[0].islower():
+        text, promotion = text[:-1], text[-1]
+    piece = text[0] if text[0] in 'NBRQK' else 'P'
+    if piece != 'P':
+        text = text[1:]
+    text = text.replace('x', '').replace('-', '')
+    if len(text) < 2 or text[-2] not in 'abcdefgh' or text[-1] not in '12345678':
+        return None
+    end = ('87654321'.index(text[-1]), 'abcdefgh'.index(text[-2]))
+    disambiguation = text[:-2]
+
+    matches = []
+    for legal_move in legal_moves:
+        start, legal_end, legal_promotion = legal_move
+        if legal_end != end or board[start[0]][start[1]].upper() != piece:
+            continue
+        if (legal_promotion.upper() if legal_promotion else None) != promotion:
+            continue
+        square = get_square_notation(*start)
+        if all(char in square for char in disambiguation):
+            matches.append(legal_move)
+    return matches[0] if len(matches) == 1 else None
+
+def perft(state, depth, buffers=None):
+    """Count the leaf nodes of the legal move tree down to depth
+
+    Each depth generates into its own buffer from buffers, made on the first
+    call, so the tree walk doesn't allocate moves.
+    """
+    if depth == 0:
+        return 1
+    if buffers is None:
+        buffers = [new_move_buffer() for _ in range(depth)]
+    buffer = buffers[depth - 1]
+    end = generate_moves_into(state, buffer)
+    if depth == 1:
+        return end
+    nodes = 0
+    for index in range(end):
+        state.make_move(buffer[index])
+        nodes += perft(state, depth - 1, buffers)
+        state.unmake_move()
+    return nodes
+
+def perft_divide(state, depth):
+    """Perft count below each root move, for finding move generator bugs"""
+    counts = []
+    for legal_move in generate_legal_moves(state):
+        state.make_move(legal_move)
+        counts.append((legal_move, perft(state, depth - 1)))
+        state.unmake_move()
+    return counts
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
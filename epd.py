@@ -0,0 +1,126 @@
+"""Run EPD test suites (bm/am opcodes) over a process pool and report solve rate and speed"""
+
+import csv
+import json
+import multiprocessing
+import shlex
+import sys
+import time
+
+import brain
+from core import GameState, move_from_san, move_to_san
+
+REPORT_FIELDS = ('id', 'solved', 'move', 'bm', 'am', 'time_to_solution', 'nodes_to_solution',
+                 'depth', 'nodes', 'time', 'nps')
+
+
+def _split_operations(text):
+    """Split EPD operations on the semicolons that are not inside a quoted operand"""
+    operations, start, quoted = [], 0, False
+    for index, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif char == ';' and not quoted:
+            operations.append(text[start:index])
+            start = index + 1
+    operations.append(text[start:])
+    return operations
+
+
+def parse_epd(line):
+    """Split an EPD line into a FEN and a dict of opcode -> list of operands"""
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"Invalid EPD line: {line}")
+    operations = {}
+    for operation in _split_operations(fields[4] if len(fields) > 4 else ''):
+        tokens = shlex.split(operation)
+        if tokens:
+            operations[tokens[0]] = tokens[1:]
+    halfmove_clock = operations.get('hmvc', ['0'])[0]
+    move_number = operations.get('fmvn', ['1'])[0]
+    return ' '.join(fields[:4] + [halfmove_clock, move_number]), operations
+
+
+def read_epd(path):
+    with open(path) as stream:
+        return [line.strip() for line in stream if line.strip() and not line.startswith('#')]
+
+
+def solve_position(task):
+    """Search one EPD position and return its report row"""
+    index, line, time_limit, node_limit = task
+    fen, operations = parse_epd(line)
+    state = GameState()
+    state.load_fen(fen)
+    best_moves = [move_from_san(state, san) for san in operations.get('bm', [])]
+    avoid_moves = [move_from_san(state, san) for san in operations.get('am', [])]
+
+    def is_solution(move):
+        if best_moves:
+            return move in best_moves
+        return move is not None and move not in avoid_moves
+
+    # Time and nodes at the iteration from which the engine kept a correct move
+    solution = [None]
+
+    def on_iteration(search):
+        if not is_solution(search.best_move):
+            solution[0] = None
+        elif solution[0] is None:
+            solution[0] = (search.elapsed(), search.nodes)
+
+    search = brain.Search(state, time_limit, node_limit, tt=brain.TranspositionTable(8), on_iteration=on_iteration)
+    move = search.run()
+    elapsed = search.elapsed()
+    solved = is_solution(move)
+    time_to_solution, nodes_to_solution = solution[0] if solved and solution[0] else (None, None)
+    return index, {
+        'id': operations.get('id', [str(index + 1)])[0],
+        'solved': solved,
+        'move': move_to_san(state, move) if move else None,
+        'bm': ' '.join(operations.get('bm', [])),
+        'am': ' '.join(operations.get('am', [])),
+        'time_to_solution': round(time_to_solution, 3) if time_to_solution is not None else None,
+        'nodes_to_solution': nodes_to_solution,
+        'depth': search.completed_depth,
+        'nodes': search.nodes,
+        'time': round(elapsed, 3),
+        'nps': int(search.nodes / max(elapsed, 1e-9)),
+    }
+
+
+def run_suite(path, time_limit=None, node_limit=None, processes=None, output_format='csv', output=None):
+    """Solve every position in an EPD file and write one report row per position
+
+    Rows go to output (a path, or stdout if None) in the original order, and
+    a summary line goes to stderr. Returns the number of solved positions.
+    """
+    lines = read_epd(path)
+    tasks = [(index, line, time_limit, node_limit) for index, line in enumerate(lines)]
+    rows = [None] * len(tasks)
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        for index, row in pool.imap_unordered(solve_position, tasks):
+            rows[index] = row
+    elapsed = time.perf_counter() - start
+
+    stream = open(output, 'w', newline='') if output else sys.stdout
+    try:
+        if output_format == 'json':
+            json.dump(rows, stream, indent=2)
+            stream.write('\n')
+        else:
+            writer = csv.DictWriter(stream, REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    finally:
+        if output:
+            stream.close()
+
+    solved = sum(1 for row in rows if row['solved'])
+    nodes = sum(row['nodes'] for row in rows)
+    search_time = sum(row['time'] for row in rows)
+    print(f"Solved {solved}/{len(rows)}  failed {len(rows) - solved}  wall time {elapsed:.2f}s  "
+          f"NPS {nodes / max(search_time, 1e-9):.0f}", file=sys.stderr)
+    return solved
@@ -0,0 +1,208 @@
+"""Static evaluation: material, tapered piece-square tables, mobility and king safety
+
+Material and piece-square terms are kept up to date by GameState.make_move and
+unmake_move through MG_TABLE, EG_TABLE and PHASE_WEIGHTS, so evaluate() only
+has to add the terms that depend on the whole board.
+"""
+
+from attacks import BISHOP_RAYS, KING_TARGETS, KNIGHT_TARGETS, QUEEN_RAYS, ROOK_RAYS
+
+# Material in centipawns for the middlegame and the endgame
+MG_VALUES = {'p': 82, 'n': 337, 'b': 365, 'r': 477, 'q': 1025, 'k': 0}
+EG_VALUES = {'p': 94, 'n': 281, 'b': 297, 'r': 512, 'q': 936, 'k': 0}
+
+# Game phase: 24 with all pieces on the board, 0 with only kings and pawns
+PHASE_WEIGHTS = {
+    'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0,
+    'p': 0, 'n': 1, 'b': 1, 'r': 2, 'q': 4, 'k': 0,
+}
+TOTAL_PHASE = 24
+
+# Piece-square tables from white's point of view, row 0 is the 8th rank
+PAWN_MG = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+PAWN_EG = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     80,  80,  80,  80,  80,  80,  80,  80,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     20,  20,  20,  20,  20,  20,  20,  20,
+     10,  10,  10,  10,  10,  10,  10,  10,
+     10,  10,  10,  10,  10,  10,  10,  10,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+KNIGHT_PST = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+BISHOP_PST = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+ROOK_PST = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+)
+QUEEN_PST = (
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+KING_MG = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+)
+KING_EG = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+MG_PST = {'p': PAWN_MG, 'n': KNIGHT_PST, 'b': BISHOP_PST, 'r': ROOK_PST, 'q': QUEEN_PST, 'k': KING_MG}
+EG_PST = {'p': PAWN_EG, 'n': KNIGHT_PST, 'b': BISHOP_PST, 'r': ROOK_PST, 'q': QUEEN_PST, 'k': KING_EG}
+
+# Mobility bonus per reachable square, (middlegame, endgame)
+MOBILITY_WEIGHTS = {'n': (4, 4), 'b': (5, 5), 'r': (2, 4), 'q': (1, 2)}
+# King safety, middlegame only
+PAWN_SHIELD_BONUS = 10  # Per own pawn on the three squares in front of the king
+KING_ZONE_ATTACK_PENALTY = 8  # Per enemy attack on a square next to the king
+
+
+def _signed_tables(values, pst):
+    """Material plus piece-square value per piece character and square, negative for black"""
+    table = {}
+    for kind, square_values in pst.items():
+        table[kind.upper()] = [values[kind] + square_values[square] for square in range(64)]
+        # Black reads the table mirrored top to bottom
+        table[kind] = [-(values[kind] + square_values[square ^ 56]) for square in range(64)]
+    return table
+
+
+MG_TABLE = _signed_tables(MG_VALUES, MG_PST)
+EG_TABLE = _signed_tables(EG_VALUES, EG_PST)
+
+
+def material_and_pst(board):
+    """Middlegame score, endgame score and phase of a board, computed from scratch"""
+    mg = eg = phase = 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece != ' ':
+                square = row * 8 + col
+                mg += MG_TABLE[piece][square]
+                eg += EG_TABLE[piece][square]
+                phase += PHASE_WEIGHTS[piece]
+    return mg, eg, phase
+
+
+def _mobility_and_king_safety(board, king_squares):
+    """Mobility (middlegame, endgame) and middlegame king safety, from white's point of view"""
+    mobility_mg = mobility_eg = 0
+    white_king, black_king = king_squares['K'], king_squares['k']
+    # Each side's pieces count attacks on the squares around the other king
+    zones = {
+        True: set(KING_TARGETS[black_king[0] * 8 + black_king[1]]),
+        False: set(KING_TARGETS[white_king[0] * 8 + white_king[1]]),
+    }
+    zone_attacks = {True: 0, False: 0}
+
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece == ' ' or piece in 'PpKk':
+                continue
+            white = piece.isupper()
+            kind = piece.lower()
+            square = row * 8 + col
+            zone = zones[white]
+            count = 0
+            if kind == 'n':
+                for r, c in KNIGHT_TARGETS[square]:
+                    target = board[r][c]
+                    if target == ' ' or target.isupper() != white:
+                        count += 1
+                    if (r, c) in zone:
+                        zone_attacks[white] += 1
+            else:
+                rays = ROOK_RAYS if kind == 'r' else BISHOP_RAYS if kind == 'b' else QUEEN_RAYS
+                for ray in rays[square]:
+                    for r, c in ray:
+                        if (r, c) in zone:
+                            zone_attacks[white] += 1
+                        target = board[r][c]
+                        if target == ' ':
+                            count += 1
+                        else:
+                            if target.isupper() != white:
+                                count += 1
+                            break
+            weight_mg, weight_eg = MOBILITY_WEIGHTS[kind]
+            sign = 1 if white else -1
+            mobility_mg += sign * weight_mg * count
+            mobility_eg += sign * weight_eg * count
+
+    king_safety = KING_ZONE_ATTACK_PENALTY * (zone_attacks[True] - zone_attacks[False])
+    king_safety += PAWN_SHIELD_BONUS * (_pawn_shield(board, white_king, 'P', -1) - _pawn_shield(board, black_king, 'p', 1))
+    return mobility_mg, mobility_eg, king_safety
+
+
+def _pawn_shield(board, king_square, pawn, step):
+    """Own pawns on the three squares in front of the king"""
+    king_row, king_col = king_square
+    shield_row = king_row + step
+    if not 0 <= shield_row < 8:
+        return 0
+    return sum(1 for col in (king_col - 1, king_col, king_col + 1)
+               if 0 <= col < 8 and board[shield_row][col] == pawn)
+
+
+def evaluate(state):
+    """Score the position in centipawns from the side to move's point of view"""
+    mobility_mg, mobility_eg, king_safety = _mobility_and_king_safety(state.chess_board, state.king_squares)
+    mg = state.mg_score + mobility_mg + king_safety
+    eg = state.eg_score + mobility_eg
+    phase = min(state.phase, TOTAL_PHASE)
+    score = (mg * phase + eg * (TOTAL_PHASE - phase)) // TOTAL_PHASE
+    return score if state.white_to_play else -score
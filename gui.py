@@ -0,0 +1,543 @@
+import copy
+import pygame
+import random
+import sys
+import threading
+
+import brain
+from core import (
+    PROMOTION_ORDER, SQUARES, GameState, encode_move, generate_moves_into, move_to_san, new_move_buffer,
+)
+
+# Constants
+WIDTH, HEIGHT = 1020, 1020
+BOARD_SIZE = 8
+SQUARE_SIZE = WIDTH // BOARD_SIZE
+PANEL_WIDTH = 300  # Width for the left panel
+ENGINE_TIME_PER_MOVE = 1.0  # Seconds the engine thinks when the move button is in engine mode
+ENGINE_POLL_MS = 50  # How often the main loop checks on a running search
+
+# Colors
+WHITE = (255, 255, 221)
+BLACK = (134, 166, 102)
+SELECTED_COLOR = (200, 0, 0)
+PANEL_COLOR = (240, 240, 240)
+TEXT_COLOR = (50, 50, 50)
+
+button_rect = pygame.Rect(WIDTH + PANEL_WIDTH + 50, 100, 150, 50)
+random_move_button = pygame.Rect(WIDTH + PANEL_WIDTH + 50, 200, 150, 50)
+takeback_button = pygame.Rect(WIDTH + PANEL_WIDTH + 50, 300, 150, 50)
+mode_button = pygame.Rect(WIDTH + PANEL_WIDTH + 50, 400, 150, 50)
+engine_info_rect = pygame.Rect(WIDTH + PANEL_WIDTH + 20, 500, 210, 160)
+
+# Chess piece images, loaded the first time each piece is drawn
+PIECE_IMAGES = {
+    'r': 'images/bR.png',
+    'b': 'images/bB.png',
+    'n': 'images/bN.png',
+    'q': 'images/bQ.png',
+    'k': 'images/bK.png',
+    'p': 'images/bp.png',
+    'R': 'images/wR.png',
+    'N': 'images/wN.png',
+    'B': 'images/wB.png',
+    'Q': 'images/wQ.png',
+    'K': 'images/wK.png',
+    'P': 'images/wp.png',
+}
+pieces = {}
+fonts = {}
+
+screen = None
+
+def get_screen():
+    """Initialize pygame and open the window on first use"""
+    global screen
+    if screen is None:
+        pygame.init()
+        screen = pygame.display.set_mode((WIDTH + PANEL_WIDTH + 250, HEIGHT))
+        pygame.display.set_caption("Chess")
+    return screen
+
+def get_piece_image(piece):
+    image = pieces.get(piece)
+    if image is None:
+        # Converting to the display format once makes every later blit cheap
+        image = pieces[piece] = pygame.image.load(PIECE_IMAGES[piece]).convert_alpha()
+    return image
+
+def get_font(size):
+    font = fonts.get(size)
+    if font is None:
+        font = fonts[size] = pygame.font.Font(None, size)
+    return font
+
+# Packed legal moves of the position on screen, regenerated on every click
+move_buffer = new_move_buffer()
+
+def find_legal_move(gs, start, end):
+    """The packed legal move between two (row, col) squares, or None; pawns promote to a queen"""
+    wanted = start[0] * 8 + start[1] | (end[0] * 8 + end[1]) << 6
+    for index in range(generate_moves_into(gs, move_buffer)):
+        code = move_buffer[index]
+        if code & 4095 == wanted and (code >> 14 != 1 or PROMOTION_ORDER[code >> 12 & 3] == 'Q'):
+            return code
+    return None
+
+def make_random_black_move(board, gs):
+    """Make a random legal move for black"""
+    count = generate_moves_into(gs, move_buffer)
+    
+    if count:
+        # Choose a random move
+        chosen = move_buffer[random.randrange(count)]
+        # Record the move before making it
+        gs.add_move(chosen)
+        
+        # Make the move
+        gs.make_move(chosen)
+        
+        return True
+    return False
+
+def format_score(score):
+    """Score in pawns, or moves to mate, for the engine panel"""
+    if score > brain.MATE_BOUND:
+        return f"M{(brain.MATE - score + 1) // 2}"
+    if score < -brain.MATE_BOUND:
+        return f"-M{(brain.MATE + score + 1) // 2}"
+    return f"{score / 100:+.2f}"
+
+class EngineWorker:
+    """Runs engine searches on a background thread so the window keeps handling events
+
+    The main loop calls poll() every frame, which hands back the move once a
+    search is done. After each engine move the worker can ponder on the reply
+    it expects; ponderhit() turns that search into a timed one when the
+    player makes the reply, anything else should cancel() it.
+    """
+
+    def __init__(self, time_limit, tt, book=None):
+        self.time_limit = time_limit
+        self.tt = tt
+        self.book = book
+        self.thread = None
+        self.search = None
+        self.stop_event = None
+        self.ponder_move = None  # Packed reply being pondered on, None for a normal search
+        self.ponder_text = None
+        self.released = False  # A ponder search keeps its move until ponderhit
+        self.result = None  # (best move, expected reply) once the thread is done
+        self.info = None  # (depth, score, nps) of the last completed iteration
+
+    def busy(self):
+        return self.thread is not None
+
+    def thinking(self):
+        """Searching for a move to play now, as opposed to pondering"""
+        return self.thread is not None and self.released
+
+    def start(self, gs, ponder_move=None):
+        """Search the position in gs, or the one after the packed ponder_move, on a copy of the game"""
+        self.cancel()
+        state = copy.deepcopy(gs)
+        if ponder_move is not None:
+            self.ponder_text = move_to_san(state, ponder_move)
+            state.make_move(ponder_move)
+        self.ponder_move = ponder_move
+        self.released = ponder_move is None
+        self.stop_event = threading.Event()
+        # Pondering has no time limit until the player makes the expected move
+        self.search = brain.Search(state, None if ponder_move is not None else self.time_limit, tt=self.tt,
+                                   stop_event=self.stop_event, on_iteration=self.on_iteration)
+        self.thread = threading.Thread(target=self.run, args=(self.search,), daemon=True)
+        self.thread.start()
+
+    def run(self, search):
+        if self.book is not None and self.ponder_move is None:
+            move = self.book.choose(search.state)
+            if move is not None:
+                self.result = (move, None)
+                return
+        move = search.run()
+        line = search.principal_variation() if move is not None else []
+        self.result = (move, line[1] if len(line) > 1 else None)
+
+    def on_iteration(self, search):
+        elapsed = max(search.elapsed(), 1e-9)
+        self.info = (search.completed_depth, search.best_score, int(search.nodes / elapsed))
+
+    def ponderhit(self):
+        """The player made the expected reply: give the search the usual time from now"""
+        self.released = True
+        self.ponder_move = None
+        if self.time_limit is not None:
+            self.search.time_limit = self.search.elapsed() + self.time_limit
+
+    def stop(self):
+        """Play the best move found so far"""
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    def cancel(self):
+        """Stop the search and throw its result away"""
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+        self.thread = self.search = self.stop_event = self.ponder_move = self.ponder_text = None
+        self.result = self.info = None
+        self.released = False
+
+    def poll(self):
+        """(move, expected reply) when a released search has finished, otherwise None"""
+        if self.thread is None or not self.released or self.thread.is_alive():
+            return None
+        self.thread.join()
+        result = self.result
+        self.thread = self.search = self.stop_event = None
+        self.result = None
+        return result
+
+    def status(self):
+        """Lines for the engine panel"""
+        if self.thread is None:
+            return ("Engine idle",)
+        lines = [f"Pondering {self.ponder_text}" if self.ponder_move is not None else "Thinking..."]
+        if self.info is not None:
+            depth, score, nps = self.info
+            lines += [f"Depth {depth}", f"Score {format_score(score)}", f"NPS {nps}"]
+        return tuple(lines)
+
+# Functions
+def draw_board(chess_board):
+    screen = get_screen()
+    for row in range(BOARD_SIZE):
+        for col in range(BOARD_SIZE):
+            color = WHITE if (row + col) % 2 == 0 else BLACK
+            pygame.draw.rect(screen, color, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+            piece = chess_board[row][col]
+            if piece != ' ':
+                screen.blit(get_piece_image(piece), (col * SQUARE_SIZE, row * SQUARE_SIZE))
+
+class Renderer:
+    """Draws the window, redrawing only the squares, panel rows and buttons that changed
+
+    The board without pieces is rendered once; after that each frame compares
+    what is on screen with the game state and passes just the changed
+    rectangles to pygame.display.update.
+    """
+    HISTORY_TOP = 80
+    HISTORY_ROW_HEIGHT = 30
+    HISTORY_ROWS = (HEIGHT - 100 - HISTORY_TOP) // HISTORY_ROW_HEIGHT + 1
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.board_surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+        for row in range(BOARD_SIZE):
+            for col in range(BOARD_SIZE):
+                color = WHITE if (row + col) % 2 == 0 else BLACK
+                pygame.draw.rect(self.board_surface, color, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        self.highlight = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE)).convert()
+        self.highlight.set_alpha(80)
+        self.highlight.fill(SELECTED_COLOR)
+        self.text_cache = {}
+        # What is currently on screen, None until first drawn
+        self.squares = [[None] * BOARD_SIZE for _ in range(BOARD_SIZE)]
+        self.history_rows = [None] * self.HISTORY_ROWS
+        self.turn = None
+        self.move_button_label = None
+        self.engine_lines = None
+        self.needs_full_redraw = True
+
+    def text(self, text, size, color):
+        """Rendered text surfaces are kept, since the same labels are drawn over and over"""
+        key = (text, size, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = self.text_cache[key] = get_font(size).render(text, True, color).convert_alpha()
+        return surface
+
+    def draw(self, gs, selected_square, engine_mode, engine_lines=()):
+        """Bring the screen up to date and return the rectangles that changed"""
+        full_redraw = self.needs_full_redraw
+        if full_redraw:
+            self.draw_static()
+            self.needs_full_redraw = False
+        dirty = self.draw_squares(gs.chess_board, selected_square)
+        dirty += self.draw_history(gs.move_history)
+        dirty += self.draw_turn(gs.white_to_play)
+        dirty += self.draw_move_button("Engine" if engine_mode else "Random")
+        dirty += self.draw_engine_info(engine_lines)
+        if full_redraw:
+            dirty = [self.screen.get_rect()]
+        if dirty:
+            pygame.display.update(dirty)
+        return dirty
+
+    def draw_static(self):
+        """Everything that never changes: background, panel frame, title and buttons"""
+        screen = self.screen
+        screen.fill((255, 255, 255))
+        panel_rect = pygame.Rect(0, 0, PANEL_WIDTH, HEIGHT)
+        pygame.draw.rect(screen, PANEL_COLOR, panel_rect)
+        pygame.draw.rect(screen, (200, 200, 200), panel_rect, 2)
+        title_text = self.text("Move History", 36, TEXT_COLOR)
+        screen.blit(title_text, title_text.get_rect(center=(PANEL_WIDTH // 2, 30)))
+
+        for rect, label, offset in ((button_rect, "Reset", 40), (takeback_button, "Takeback", 20), (mode_button, "Mode", 40)):
+            pygame.draw.rect(screen, (0, 0, 0), rect)
+            screen.blit(self.text(label, 36, (255, 255, 255)), (rect.x + offset, rect.y + 15))
+        self.squares = [[None] * BOARD_SIZE for _ in range(BOARD_SIZE)]
+        self.history_rows = [None] * self.HISTORY_ROWS
+        self.turn = None
+        self.move_button_label = None
+        self.engine_lines = None
+
+    def draw_squares(self, chess_board, selected_square):
+        dirty = []
+        for row in range(BOARD_SIZE):
+            for col in range(BOARD_SIZE):
+                shown = (chess_board[row][col], (row, col) == selected_square)
+                if self.squares[row][col] == shown:
+                    continue
+                self.squares[row][col] = shown
+                piece, selected = shown
+                area = pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+                position = (PANEL_WIDTH + area.x, area.y)
+                self.screen.blit(self.board_surface, position, area)
+                if piece != ' ':
+                    self.screen.blit(get_piece_image(piece), position)
+                if selected:
+                    self.screen.blit(self.highlight, position)
+                dirty.append(pygame.Rect(position, area.size))
+        return dirty
+
+    def draw_history(self, move_history):
+        """Two moves per row, as many rows as fit above the turn indicator"""
+        dirty = []
+        for index in range(self.HISTORY_ROWS):
+            shown = tuple(move_history[index * 2:index * 2 + 2])
+            if self.history_rows[index] == shown:
+                continue
+            self.history_rows[index] = shown
+            rect = pygame.Rect(2, self.HISTORY_TOP + index * self.HISTORY_ROW_HEIGHT, PANEL_WIDTH - 4, self.HISTORY_ROW_HEIGHT)
+            self.screen.fill(PANEL_COLOR, rect)
+            if shown:
+                self.screen.blit(self.text(f"{index + 1}.", 24, TEXT_COLOR), (20, rect.y))
+            for move_text, x_offset in zip(shown, (70, 160)):
+                self.screen.blit(self.text(move_text, 24, TEXT_COLOR), (x_offset, rect.y))
+            dirty.append(rect)
+        return dirty
+
+    def draw_turn(self, white_to_play):
+        if self.turn == white_to_play:
+            return []
+        self.turn = white_to_play
+        rect = pygame.Rect(2, HEIGHT - 70, PANEL_WIDTH - 4, 40)
+        self.screen.fill(PANEL_COLOR, rect)
+        turn_text = "White's Turn" if white_to_play else "Black's Turn"
+        turn_color = (0, 100, 0) if white_to_play else (100, 0, 0)
+        turn_surface = self.text(turn_text, 36, turn_color)
+        self.screen.blit(turn_surface, turn_surface.get_rect(center=(PANEL_WIDTH // 2, HEIGHT - 50)))
+        return [rect]
+
+    def draw_move_button(self, label):
+        if self.move_button_label == label:
+            return []
+        self.move_button_label = label
+        pygame.draw.rect(self.screen, (0, 0, 0), random_move_button)
+        self.screen.blit(self.text(label, 36, (255, 255, 255)), (random_move_button.x + 30, random_move_button.y + 15))
+        return [random_move_button]
+
+    def draw_engine_info(self, lines):
+        """Live search status: what the engine is doing, depth, score and speed"""
+        if self.engine_lines == lines:
+            return []
+        self.engine_lines = lines
+        self.screen.fill((255, 255, 255), engine_info_rect)
+        for index, line in enumerate(lines):
+            self.screen.blit(self.text(line, 30, TEXT_COLOR), (engine_info_rect.x, engine_info_rect.y + index * 35))
+        return [engine_info_rect]
+
+def get_square(mouse_pos):
+    row = mouse_pos[1] // SQUARE_SIZE
+    col = (mouse_pos[0] - PANEL_WIDTH) // SQUARE_SIZE  # Adjust for panel width
+    return row, col
+
+def main(engine_time=ENGINE_TIME_PER_MOVE, book=None):
+    """Run the game window; book is an optional PolyglotBook for the engine move button
+
+    In engine mode the engine answers each of white's moves by itself on a
+    background thread, and ponders on white's reply while the player thinks.
+    """
+
+    renderer = Renderer(get_screen())
+    selected_square = None
+    engine_mode = False  # Move button plays the engine's move instead of a random one
+    tt = brain.TranspositionTable()
+    engine = EngineWorker(engine_time, tt, book)
+    notice = None  # Outcome of the last button press, shown in the engine panel while the engine is idle
+
+    gs = GameState()
+    chess_board = gs.getBoard()
+    while True:
+        # Sleep until something happens instead of redrawing at a fixed frame
+        # rate, but wake up regularly while the engine is searching
+        events = [pygame.event.wait(ENGINE_POLL_MS if engine.busy() else 0)] + pygame.event.get()
+        for event in events:
+            if event.type == pygame.QUIT:
+                engine.cancel()
+                pygame.quit()
+                sys.exit()
+
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # The window was uncovered, so its contents may be gone
+                renderer.needs_full_redraw = True
+
+            elif pygame.key.get_pressed()[pygame.K_BACKSPACE]:
+                engine.cancel()
+                pygame.quit()
+                return
+
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                mouse_pos = pygame.mouse.get_pos()
+
+                # Check if click is on the board (not on the panel)
+                if mouse_pos[0] >= PANEL_WIDTH:
+                    row, col = get_square(mouse_pos)
+                    hovered = button_rect.collidepoint(mouse_pos)
+                    random_button_hovered = random_move_button.collidepoint(mouse_pos)
+                    
+                    # Handle random move button click
+                    if random_button_hovered and not gs.white_to_play:
+                        if engine_mode:
+                            if engine.thinking():
+                                # Move now with the best move so far
+                                engine.stop()
+                            else:
+                                engine.start(gs)
+                        elif make_random_black_move(chess_board, gs):
+                            notice = None
+                        else:
+                            notice = "No legal moves"
+                        continue
+                    
+                    # Handle mode button click
+                    if mode_button.collidepoint(mouse_pos):
+                        engine_mode = not engine_mode
+                        if not engine_mode:
+                            engine.cancel()
+                        continue
+                    
+                    # Handle takeback button click
+                    if takeback_button.collidepoint(mouse_pos):
+                        engine.cancel()
+                        if gs.take_back():
+                            selected_square = None
+                            notice = "Move taken back"
+                        continue
+                    
+                    # Handle reset button click
+                    if hovered:
+                        engine.cancel()
+                        gs.reset_board()
+                        tt.clear()
+                        chess_board = gs.getBoard()
+                        selected_square = None
+                        notice = "Board reset"
+                        continue
+                    
+                    # Handle board clicks
+                    if 0 <= row < 8 and 0 <= col < 8:
+                        if selected_square is None:
+                            # Checks to see who's turn it is
+                            if gs.white_to_play is True and chess_board[row][col].isupper():
+                                selected_square = (row, col)
+                            elif gs.white_to_play is False and chess_board[row][col].islower():
+                                selected_square = (row, col)
+                            else:
+                                continue
+                        else:
+                            move = find_legal_move(gs, selected_square, (row, col))
+                            if move is not None:
+                                pondered = engine.ponder_move == move
+                                # Record the move before making it
+                                gs.add_move(move)
+                                
+                                gs.make_move(move)
+                                selected_square = None
+                                notice = None
+                                if pondered:
+                                    engine.ponderhit()
+                                else:
+                                    engine.cancel()
+                                    if engine_mode and not gs.white_to_play:
+                                        engine.start(gs)
+                            else:
+                                selected_square = None
+
+        result = engine.poll()
+        if result is not None:
+            move, reply = result
+            if move is None:
+                notice = "No legal moves"
+            else:
+                move = encode_move(gs, move)
+                gs.add_move(move)
+                gs.make_move(move)
+                selected_square = None
+                notice = None
+                if engine_mode and reply is not None:
+                    engine.start(gs, encode_move(gs, reply))
+
+        engine_lines = (notice,) if notice is not None and not engine.busy() else engine.status()
+        renderer.draw(gs, selected_square, engine_mode, engine_lines)
+
+
+def find_valid_moves():
+    screen = get_screen()
+    gs = GameState()
+    chess_board = gs.getBoard()
+    clock = pygame.time.Clock()
+    i = 0
+
+    for index in range(generate_moves_into(gs, move_buffer)):
+        valid_move = move_buffer[index]
+        start_row, start_col = SQUARES[valid_move & 63]
+        if chess_board[start_row][start_col] in 'Pp':
+            continue
+
+        gs.make_move(valid_move)
+        print("valid move")
+        
+        # Handle events
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+        
+        # Draw and update display
+        screen.fill((255, 255, 255))
+        draw_board(chess_board)
+        pygame.display.flip()
+        pygame.time.wait(1000)
+        
+        # Control frame rate
+        clock.tick(5)  # Limit to 5 frames per second
+        i += 1
+        gs.unmake_move()
+    print(f"Total valid moves found: {i}")
+                    
+
+
+def test_valid_moves():
+        gs = GameState()
+        chess_board = gs.getBoard()
+        for row in chess_board:
+            for piece in row:
+                print(piece)
+
+if __name__ == "__main__":
+    # test_valid_moves()
+    main()
+    # find_valid_moves()
@@ -0,0 +1,138 @@
+"""PGN reading and writing
+
+read_games() streams a file one game at a time, so archives of any size can
+be imported with memory proportional to the longest game. Moves are
+resolved against the legal move generator, and games are written back out
+in SAN.
+"""
+
+import re
+import sys
+
+from core import GameState, STARTING_FEN, generate_legal_moves, move_from_san, move_to_san
+
+HEADER_RE = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+# Comments, variation brackets, NAGs, move numbers, results and everything else as moves
+TOKEN_RE = re.compile(r'\{[^}]*\}|;[^\n]*|[()]|\$\d+|\d+\.+|1-0|0-1|1/2-1/2|\*|[^\s{}();]+')
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+NULL_MOVES = ('--', 'Z0', '0000')  # Null move spellings, which GameState can't play
+# The seven tag roster, in the order the PGN standard puts them
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+
+
+def read_games(stream, on_error=None):
+    """Yield (headers, moves) for each game in a PGN text stream
+
+    headers is a dict of tag pairs and moves a list of move tuples, legal
+    from the starting position given by the FEN tag or the usual start. A
+    game with a bad FEN, an illegal move or a null move is left out and
+    reading goes on with the next one; on_error is called with its headers
+    and the ValueError, and without it the error is reported on stderr.
+    """
+    def parsed(headers, movetext):
+        try:
+            return _parse_movetext(headers, '\n'.join(movetext))
+        except ValueError as error:
+            if on_error is not None:
+                on_error(headers, error)
+            else:
+                print(f"Skipped game: {error}", file=sys.stderr)
+            return None
+
+    headers = {}
+    movetext = []  # Lines are kept apart since a ; comment ends with its line
+    open_comments = 0  # A brace comment can run over several lines
+    for line in stream:
+        line = line.strip()
+        if line.startswith('%'):
+            continue
+        if line.startswith('[') and not open_comments:
+            if movetext:
+                moves = parsed(headers, movetext)
+                if moves is not None:
+                    yield headers, moves
+                headers, movetext = {}, []
+            match = HEADER_RE.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+        elif line:
+            movetext.append(line)
+            open_comments += line.count('{') - line.count('}')
+    if headers or movetext:
+        moves = parsed(headers, movetext)
+        if moves is not None:
+            yield headers, moves
+
+
+def _parse_movetext(headers, text):
+    state = GameState()
+    game = f"{headers.get('White', '?')} - {headers.get('Black', '?')}"
+    if 'FEN' in headers:
+        try:
+            state.load_fen(headers['FEN'])
+        except (IndexError, KeyError, ValueError):
+            raise ValueError(f"Bad FEN {headers['FEN']} in game {game}") from None
+    moves = []
+    variation_depth = 0
+    for token in TOKEN_RE.findall(text):
+        if token == '(':
+            variation_depth += 1
+        elif token == ')':
+            variation_depth -= 1
+        elif (variation_depth or token[0] in '{;$' or token in RESULTS or token == 'e.p.'
+              or token[0].isdigit() and token.endswith('.')):
+            continue
+        elif token in NULL_MOVES:
+            raise ValueError(f"Null move {token} after {len(moves)} plies in game {game}")
+        else:
+            # Some writers mark en passant captures, as exd6e.p. or exd6 e.p.
+            move = move_from_san(state, token[:-4] if token.endswith('e.p.') else token)
+            if move is None:
+                raise ValueError(f"Illegal move {token} after {len(moves)} plies in game {game}")
+            moves.append(move)
+            state.make_move(move)
+    return moves
+
+
+def format_game(headers, moves, fen=None):
+    """PGN text for a game played from fen, or the start position, with SAN movetext"""
+    state = GameState()
+    headers = dict(headers)
+    if fen is not None and fen != STARTING_FEN:
+        state.load_fen(fen)
+        headers['SetUp'] = '1'
+        headers['FEN'] = fen
+    result = headers.setdefault('Result', '*')
+
+    names = list(SEVEN_TAG_ROSTER) + [name for name in headers if name not in SEVEN_TAG_ROSTER]
+    lines = []
+    for name in names:
+        value = str(headers.get(name, '?')).replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f'[{name} "{value}"]')
+    lines.append('')
+
+    tokens = []
+    for move in moves:
+        if state.white_to_play:
+            tokens.append(f'{state.move_number}.')
+        elif not tokens:
+            tokens.append(f'{state.move_number}...')
+        tokens.append(move_to_san(state, move, generate_legal_moves(state)))
+        state.make_move(move)
+    tokens.append(result)
+
+    # The standard keeps movetext lines under 80 characters
+    line = ''
+    for token in tokens:
+        if line and len(line) + len(token) + 1 > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
+
+
+def write_game(stream, headers, moves, fen=None):
+    stream.write(format_game(headers, moves, fen))
+
@@ -0,0 +1,142 @@
+"""Headless self-play: play many engine games over a process pool and stream them to PGN"""
+
+import math
+import multiprocessing
+import random
+import time
+from collections import Counter
+from datetime import date
+
+import brain
+from book import PolyglotBook
+from core import GameState, generate_legal_moves
+from pgn import format_game
+
+MAX_PLIES = 400  # Games still going after this many plies are scored as draws
+
+
+def parse_engine(spec):
+    """Turn 'random', 'depth:N', 'time:SECONDS' or 'nodes:N' into (kind, limit)"""
+    if spec == 'random':
+        return 'random', None
+    kind, _, value = spec.partition(':')
+    if kind == 'depth' or kind == 'nodes':
+        return kind, int(value)
+    if kind == 'time':
+        return kind, float(value)
+    raise ValueError(f"Unknown engine spec: {spec}")
+
+
+def choose_move(state, engine, rng, tt, opening_book=None):
+    kind, limit = engine
+    if kind == 'random':
+        return rng.choice(generate_legal_moves(state))
+    if kind == 'depth':
+        return brain.find_best_move(state, max_depth=limit, tt=tt, book=opening_book)
+    if kind == 'nodes':
+        return brain.find_best_move(state, node_limit=limit, tt=tt, book=opening_book)
+    return brain.find_best_move(state, time_limit=limit, tt=tt, book=opening_book)
+
+
+def insufficient_material(board):
+    """Only kings, or a king and a single minor piece against a bare king"""
+    pieces = [piece for row in board for piece in row if piece != ' ' and piece not in 'Kk']
+    return not pieces or (len(pieces) == 1 and pieces[0] in 'NBnb')
+
+
+def play_game(task):
+    """Play one game; returns (index, result, PGN text)"""
+    index, white_spec, black_spec, opening_plies, seed, book_path = task
+    rng = random.Random(seed)
+    opening_book = PolyglotBook(book_path, rng=rng) if book_path else None
+    engines = {True: parse_engine(white_spec), False: parse_engine(black_spec)}
+    tt = brain.TranspositionTable(4)
+    gs = GameState()
+    seen = Counter([gs.hash])
+    moves = []
+
+    while True:
+        legal_moves = generate_legal_moves(gs)
+        if not legal_moves:
+            if gs.in_check():
+                result = '0-1' if gs.white_to_play else '1-0'
+            else:
+                result = '1/2-1/2'
+            break
+        if (gs.halfmove_clock >= 100 or seen[gs.hash] >= 3 or insufficient_material(gs.chess_board)
+                or len(moves) >= MAX_PLIES):
+            result = '1/2-1/2'
+            break
+
+        # Random opening moves so games from the same engines differ
+        if len(moves) < opening_plies:
+            move = rng.choice(legal_moves)
+        else:
+            move = choose_move(gs, engines[gs.white_to_play], rng, tt, opening_book)
+        moves.append(move)
+        gs.make_move(move)
+        seen[gs.hash] += 1
+    if opening_book is not None:
+        opening_book.close()
+
+    headers = {
+        'Event': 'Self-play',
+        'Date': date.today().strftime('%Y.%m.%d'),
+        'Round': str(index + 1),
+        'White': white_spec,
+        'Black': black_spec,
+        'Result': result,
+    }
+    # SAN needs the move generator, so the workers format the game too
+    return index, result, format_game(headers, moves)
+
+
+def score_summary(wins, draws, losses):
+    """Score, Elo difference and 95% error bars from engine1's point of view"""
+    games = wins + draws + losses
+    if games == 0:
+        return 0.5, 0.0, 0.0
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def elo(s):
+        s = min(max(s, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / s - 1)
+
+    return score, elo(score), (elo(score + margin) - elo(score - margin)) / 2
+
+
+def run_selfplay(games, engine1, engine2, output, processes=None, opening_plies=8, seed=None, book_path=None):
+    """Play games between two engines, alternating colors, and append them to a PGN file
+
+    Finished games are written as soon as they come back from the pool, so
+    memory use doesn't grow with the number of games.
+    """
+    seed = random.randrange(1 << 30) if seed is None else seed
+    tasks = []
+    for index in range(games):
+        white, black = (engine1, engine2) if index % 2 == 0 else (engine2, engine1)
+        tasks.append((index, white, black, opening_plies, seed + index, book_path))
+
+    wins = draws = losses = 0
+    start = time.perf_counter()
+    with open(output, 'a') as pgn, multiprocessing.Pool(processes) as pool:
+        for done, (index, result, text) in enumerate(pool.imap_unordered(play_game, tasks), 1):
+            pgn.write(text)
+            pgn.flush()
+
+            engine1_white = index % 2 == 0
+            if result == '1/2-1/2':
+                draws += 1
+            elif (result == '1-0') == engine1_white:
+                wins += 1
+            else:
+                losses += 1
+
+            if done % 10 == 0 or done == games:
+                elapsed = time.perf_counter() - start
+                score, elo, margin = score_summary(wins, draws, losses)
+                print(f"{done}/{games} games  {done / elapsed:.2f} games/s  "
+                      f"W/D/L {wins}/{draws}/{losses}  score {score:.3f}  Elo {elo:+.0f} +/- {margin:.0f}")
+    return wins, draws, losses
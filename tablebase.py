@@ -0,0 +1,283 @@
+"""Endgame tablebases for king and one piece against a bare king (KQK, KRK, KPK)
+
+Tables are generated by retrograde analysis and store the distance to mate in
+plies for every position of a material signature. Each position has a fixed
+index, so a probe is a single read from the memory-mapped file.
+
+File layout: a 16-byte header (MAGIC and the signature) followed by one byte
+per index, 0 for a draw or an illegal position and otherwise 1 plus the
+number of plies until the stronger side mates. The stronger side is always
+stored as white. Pawnless tables put the white king in the a1-d1-d4
+triangle, KPK only mirrors it onto files a-d.
+"""
+
+import mmap
+import multiprocessing
+import os
+from collections import defaultdict
+
+from attacks import KING_TARGETS
+from core import GameState, generate_legal_moves, is_square_attacked
+
+MAGIC = b'CHESSTB1'
+HEADER_SIZE = 16
+SIGNATURES = {'KQK': 'Q', 'KRK': 'R', 'KPK': 'P'}
+# Tables a signature converts into, which must be generated first
+DEPENDENCIES = {'KQK': (), 'KRK': (), 'KPK': ('KQK', 'KRK')}
+CHUNK_SIZE = 4096  # Indexes per work item in the generation pool
+
+STRONG, WEAK = 0, 1  # Side to move in the index
+
+
+def _file_rank(square):
+    row, col = divmod(square, 8)
+    return col, 7 - row
+
+
+# White king squares allowed by symmetry, in index order
+TRIANGLE = [square for square in range(64) if _file_rank(square)[0] <= 3 and _file_rank(square)[1] <= _file_rank(square)[0]]
+HALF_BOARD = [square for square in range(64) if square % 8 <= 3]
+TRIANGLE_INDEX = {square: index for index, square in enumerate(TRIANGLE)}
+HALF_BOARD_INDEX = {square: index for index, square in enumerate(HALF_BOARD)}
+
+
+def table_size(signature):
+    king_squares = HALF_BOARD if SIGNATURES[signature] == 'P' else TRIANGLE
+    return 2 * len(king_squares) * 64 * 64
+
+
+def _normalize(white_king, black_king, piece_square, pawns):
+    """Map the three squares onto the symmetric position the table stores"""
+    squares = (white_king, black_king, piece_square)
+    row, col = divmod(white_king, 8)
+    if col > 3:
+        squares = tuple(square ^ 7 for square in squares)
+        col = 7 - col
+    if pawns:
+        return squares
+    if row < 4:
+        squares = tuple(square ^ 56 for square in squares)
+        row = 7 - row
+    if 7 - row > col:
+        # Reflect in the a1-h8 diagonal
+        squares = tuple((7 - square % 8) * 8 + 7 - square // 8 for square in squares)
+    return squares
+
+
+def position_index(side, white_king, black_king, piece_square, pawns):
+    white_king, black_king, piece_square = _normalize(white_king, black_king, piece_square, pawns)
+    if pawns:
+        king_index, king_count = HALF_BOARD_INDEX[white_king], len(HALF_BOARD)
+    else:
+        king_index, king_count = TRIANGLE_INDEX[white_king], len(TRIANGLE)
+    return ((side * king_count + king_index) * 64 + black_king) * 64 + piece_square
+
+
+def _decode_index(index, pawns):
+    king_squares = HALF_BOARD if pawns else TRIANGLE
+    piece_square = index & 63
+    black_king = index >> 6 & 63
+    side, king_index = divmod(index >> 12, len(king_squares))
+    return side, king_squares[king_index], black_king, piece_square
+
+
+def _fen(white_king, black_king, piece, piece_square, white_to_play):
+    board = [' '] * 64
+    board[white_king], board[black_king], board[piece_square] = 'K', 'k', piece
+    rows = []
+    for row in range(8):
+        fen_row = ''
+        empty = 0
+        for piece_char in board[row * 8:row * 8 + 8]:
+            if piece_char == ' ':
+                empty += 1
+                continue
+            fen_row += (str(empty) if empty else '') + piece_char
+            empty = 0
+        rows.append(fen_row + (str(empty) if empty else ''))
+    return f"{'/'.join(rows)} {'w' if white_to_play else 'b'} - - 0 1"
+
+
+class Tablebases:
+    """The tables found in a directory, opened with mmap"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+        self.maps = {}
+        for signature in SIGNATURES:
+            path = os.path.join(directory, signature + '.tb')
+            if not os.path.exists(path):
+                continue
+            table_file = open(path, 'rb')
+            table_map = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if table_map[:HEADER_SIZE] != MAGIC + signature.encode().ljust(8, b'\0'):
+                raise ValueError(f"{path} is not a {signature} tablebase")
+            self.files[signature], self.maps[signature] = table_file, table_map
+
+    def close(self):
+        for table_map in self.maps.values():
+            table_map.close()
+        for table_file in self.files.values():
+            table_file.close()
+        self.maps, self.files = {}, {}
+
+    def value(self, signature, index):
+        """Raw stored byte: 0 for a draw, otherwise 1 plus plies to mate"""
+        return self.maps[signature][HEADER_SIZE + index]
+
+    def probe(self, state):
+        """(outcome, plies) for the side to move, or None if no table covers the position
+
+        outcome is 1 when the side to move mates in plies, -1 when it gets
+        mated in plies and 0 for a draw.
+        """
+        # Queen is the heaviest piece with a table, so anything more isn't covered
+        if state.phase > 4 or state.castling_rights:
+            return None
+        board = state.chess_board
+        piece = None
+        for row in range(8):
+            for col in range(8):
+                char = board[row][col]
+                if char != ' ' and char not in 'Kk':
+                    if piece is not None:
+                        return None
+                    piece, piece_square = char, row * 8 + col
+        if piece is None:
+            return None
+        signature = 'K' + piece.upper() + 'K'
+        if signature not in self.maps:
+            return None
+
+        white_king, black_king = state.king_squares['K'], state.king_squares['k']
+        strong_king, weak_king = white_king[0] * 8 + white_king[1], black_king[0] * 8 + black_king[1]
+        strong_to_move = state.white_to_play
+        if piece.islower():
+            # Tables have the stronger side as white: mirror the board top to bottom
+            strong_king, weak_king, piece_square = weak_king ^ 56, strong_king ^ 56, piece_square ^ 56
+            strong_to_move = not strong_to_move
+        index = position_index(STRONG if strong_to_move else WEAK, strong_king, weak_king, piece_square, piece in 'Pp')
+        value = self.maps[signature][HEADER_SIZE + index]
+        if value == 0:
+            return 0, 0
+        return (1 if strong_to_move else -1), value - 1
+
+
+_worker_tables = None
+
+
+def _expand(task):
+    """Legal positions in an index range and their successors, for the retrograde pass
+
+    Returns one entry per index: None for illegal positions, otherwise
+    (children, mated, conversion_win, escapes) where children are the
+    indexes reached in this table, conversion_win the fastest win through a
+    promotion and escapes whether the weaker side can capture the piece.
+    """
+    global _worker_tables
+    signature, directory, start, stop = task
+    if _worker_tables is None:
+        _worker_tables = Tablebases(directory)
+    piece = SIGNATURES[signature]
+    pawns = piece == 'P'
+    state = GameState()
+    results = []
+    for index in range(start, stop):
+        side, white_king, black_king, piece_square = _decode_index(index, pawns)
+        if (len({white_king, black_king, piece_square}) < 3
+                or divmod(black_king, 8) in KING_TARGETS[white_king]
+                or (pawns and piece_square // 8 in (0, 7))):
+            results.append(None)
+            continue
+        state.load_fen(_fen(white_king, black_king, piece, piece_square, side == STRONG))
+        # The side that just moved can't have left its opponent's king in check
+        if side == STRONG and is_square_attacked(state, divmod(black_king, 8), 'w'):
+            results.append(None)
+            continue
+
+        moves = generate_legal_moves(state)
+        children = []
+        conversion_win = None
+        escapes = False
+        for (start_row, start_col), (end_row, end_col), promotion in moves:
+            move_start, move_end = start_row * 8 + start_col, end_row * 8 + end_col
+            if side == WEAK:
+                if move_end == piece_square:
+                    escapes = True
+                else:
+                    children.append(position_index(STRONG, white_king, move_end, piece_square, pawns))
+            elif move_start == white_king:
+                children.append(position_index(WEAK, move_end, black_king, piece_square, pawns))
+            elif promotion:
+                converted = 'K' + promotion.upper() + 'K'
+                if converted in _worker_tables.maps:
+                    value = _worker_tables.value(converted, position_index(WEAK, white_king, black_king, move_end, False))
+                    if value and (conversion_win is None or value < conversion_win):
+                        conversion_win = value
+            else:
+                children.append(position_index(WEAK, white_king, black_king, move_end, pawns))
+        mated = not moves and state.in_check()
+        results.append((children, mated, conversion_win, escapes))
+    return results
+
+
+def generate(signature, directory, processes=None):
+    """Build the table for signature in directory and return its path"""
+    for dependency in DEPENDENCIES[signature]:
+        if not os.path.exists(os.path.join(directory, dependency + '.tb')):
+            generate(dependency, directory, processes)
+    os.makedirs(directory, exist_ok=True)
+
+    size = table_size(signature)
+    tasks = [(signature, directory, start, min(start + CHUNK_SIZE, size)) for start in range(0, size, CHUNK_SIZE)]
+    with multiprocessing.Pool(processes) as pool:
+        positions = [entry for chunk in pool.imap(_expand, tasks) for entry in chunk]
+
+    # Retrograde pass: settle positions in order of distance to mate, from
+    # the mates backwards through each position's predecessors
+    predecessors = [[] for _ in range(size)]
+    unresolved_children = [0] * size
+    queue = defaultdict(list)
+    half = size // 2  # Indexes from here on have the weaker side to move
+    for index, position in enumerate(positions):
+        if position is None:
+            continue
+        children, mated, conversion_win, escapes = position
+        for child in children:
+            predecessors[child].append(index)
+        if index >= half:
+            if mated:
+                queue[0].append(index)
+            elif escapes or not children:
+                # A capture or stalemate saves the weaker side
+                unresolved_children[index] = -1
+            else:
+                unresolved_children[index] = len(children)
+        elif conversion_win is not None:
+            queue[conversion_win].append(index)
+
+    values = bytearray(size)
+    distance = 0
+    while distance <= max(queue, default=-1):
+        for index in queue.pop(distance, ()):
+            if values[index]:
+                continue
+            values[index] = distance + 1
+            for predecessor in predecessors[index]:
+                if index >= half:
+                    # Any move into a lost position wins
+                    if not values[predecessor]:
+                        queue[distance + 1].append(predecessor)
+                elif unresolved_children[predecessor] > 0:
+                    # The weaker side is lost once every move loses
+                    unresolved_children[predecessor] -= 1
+                    if unresolved_children[predecessor] == 0:
+                        queue[distance + 1].append(predecessor)
+        distance += 1
+
+    path = os.path.join(directory, signature + '.tb')
+    with open(path, 'wb') as table_file:
+        table_file.write(MAGIC + signature.encode().ljust(8, b'\0'))
+        table_file.write(values)
+    return path
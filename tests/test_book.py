@@ -0,0 +1,22 @@
+import pytest
+
+from book import polyglot_key
+from core import GameState, move_from_uci
+
+# Keys from the Polyglot book format specification
+SPEC_KEYS = [
+    ((), 0x463B96181691FC9C),
+    (('e2e4',), 0x823C9B50FD114196),
+    (('e2e4', 'd7d5'), 0x0756B94461C50FB0),
+    (('e2e4', 'd7d5', 'e4e5'), 0x662FAFB965DB29D4),
+    (('e2e4', 'd7d5', 'e4e5', 'f7f5'), 0x22A48B5A8E47FF78),
+]
+
+
+@pytest.mark.parametrize('backend', ['list', 'bitboard'])
+@pytest.mark.parametrize('moves, key', SPEC_KEYS, ids=[' '.join(moves) or 'start' for moves, _ in SPEC_KEYS])
+def test_polyglot_key_matches_spec(backend, moves, key):
+    state = GameState(backend)
+    for text in moves:
+        state.make_move(move_from_uci(state, text))
+    assert polyglot_key(state) == key
@@ -0,0 +1,17 @@
+from epd import parse_epd
+
+
+def test_parse_epd():
+    fen, operations = parse_epd('2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - bm Qg6; id "WAC.001";')
+    assert fen == '2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - 0 1'
+    assert operations == {'bm': ['Qg6'], 'id': ['WAC.001']}
+
+
+def test_semicolon_inside_quoted_operand():
+    _, operations = parse_epd('4k3/8/8/8/8/8/8/4K2R w K - bm O-O; c0 "foo; bar"; id "x;y"; hmvc 3;')
+    assert operations == {'bm': ['O-O'], 'c0': ['foo; bar'], 'id': ['x;y'], 'hmvc': ['3']}
+
+
+def test_move_counters():
+    fen, _ = parse_epd('4k3/8/8/8/8/8/8/4K2R b K - hmvc 12; fmvn 40;')
+    assert fen == '4k3/8/8/8/8/8/8/4K2R b K - 12 40'
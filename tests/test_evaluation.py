@@ -0,0 +1,30 @@
+from core import GameState
+from evaluation import _mobility_and_king_safety, evaluate
+
+
+def king_safety(fen):
+    state = GameState()
+    state.load_fen(fen)
+    return _mobility_and_king_safety(state.chess_board, state.king_squares)[2]
+
+
+def test_attacks_on_own_king_zone_count_against():
+    # Black's queen on a1 attacks the squares around white's king
+    assert king_safety('6k1/5ppp/8/8/8/8/5PPP/q5K1 w - - 0 1') < 0
+
+
+def test_king_safety_is_symmetric():
+    black_attacking = king_safety('6k1/5ppp/8/8/8/8/5PPP/q5K1 w - - 0 1')
+    white_attacking = king_safety('Q5k1/5ppp/8/8/8/8/5PPP/6K1 w - - 0 1')
+    assert white_attacking == -black_attacking
+
+
+def test_evaluation_is_from_side_to_move():
+    white, black = GameState(), GameState()
+    white.load_fen('6k1/5ppp/8/8/8/8/5PPP/q5K1 w - - 0 1')
+    black.load_fen('6k1/5ppp/8/8/8/8/5PPP/q5K1 b - - 0 1')
+    assert evaluate(white) == -evaluate(black)
+
+
+def test_start_position_is_level():
+    assert evaluate(GameState()) == 0
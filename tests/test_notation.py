@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from chess import PERFT_SUITE
+from core import (
+    GameState, STARTING_FEN, decode_move, encode_move, generate_legal_moves, move_from_san, move_from_uci,
+    move_to_san, move_to_uci,
+)
+
+FENS = [fen for _, fen, _ in PERFT_SUITE]
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_fen_round_trip(fen):
+    state = GameState()
+    state.load_fen(fen)
+    assert state.to_fen() == fen
+
+
+def test_fen_after_moves():
+    state = GameState()
+    for text in ('e2e4', 'c7c5', 'g1f3'):
+        state.make_move(move_from_uci(state, text))
+    assert state.to_fen() == "rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"
+
+
+def test_san_examples():
+    state = GameState()
+    state.load_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    assert move_to_san(state, move_from_uci(state, 'e1g1')) == 'O-O'
+    assert move_to_san(state, move_from_uci(state, 'e2a6')) == 'Bxa6'
+    assert move_to_san(state, move_from_uci(state, 'c3b5')) == 'Nb5'
+    state.load_fen(STARTING_FEN)
+    assert move_to_san(state, move_from_uci(state, 'g1f3')) == 'Nf3'
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_san_uci_and_packed_round_trips(fen):
+    rng = random.Random(fen)
+    state = GameState()
+    state.load_fen(fen)
+    for _ in range(40):
+        moves = generate_legal_moves(state)
+        if not moves:
+            break
+        for move in moves:
+            assert move_from_san(state, move_to_san(state, move)) == move
+            assert move_from_uci(state, move_to_uci(move)) == move
+            assert decode_move(encode_move(state, move)) == move
+        state.make_move(rng.choice(moves))
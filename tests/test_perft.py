@@ -0,0 +1,15 @@
+import pytest
+
+from chess import PERFT_SUITE
+from core import GameState, perft
+
+
+@pytest.mark.parametrize('backend', ['list', 'bitboard'])
+@pytest.mark.parametrize('name, fen, counts', PERFT_SUITE, ids=[name for name, _, _ in PERFT_SUITE])
+def test_perft_suite(backend, name, fen, counts):
+    state = GameState(backend)
+    state.load_fen(fen)
+    for depth, expected in enumerate(counts[:3], 1):
+        assert perft(state, depth) == expected
+    # The walk leaves the position as it found it
+    assert state.to_fen() == fen
@@ -0,0 +1,63 @@
+import io
+
+from pgn import format_game, read_games
+
+COMMENTED_GAME = """[Event "Check"]
+[White "A"]
+[Black "B"]
+
+1. e4 e5 ; rest-of-line comment
+2. Nf3 Nc6 {a brace comment
+over two lines} 3. Bb5 (3. Bc4 Bc5) a6 4. Ba4 1-0
+
+[Event "Next"]
+
+1. d4 d5 *
+"""
+
+# A FEN game with an e.p. mark, a game with a null move, then a clean game
+MIXED_GAMES = """[Event "En passant"]
+[SetUp "1"]
+[FEN "rnbqkbnr/ppp1pppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq - 0 1"]
+
+1... Nf6 2. d5 e5 3. dxe6 e.p. Bxe6 *
+
+[Event "Null move"]
+
+1. e4 -- 2. d4 *
+
+[Event "Bad move"]
+
+1. e4 Ke3 *
+
+[Event "Clean"]
+
+1. d4 d5 2. c4 *
+"""
+
+
+def test_comments_and_variations():
+    games = list(read_games(io.StringIO(COMMENTED_GAME)))
+    assert [headers['Event'] for headers, _ in games] == ['Check', 'Next']
+    assert len(games[0][1]) == 7
+    assert len(games[1][1]) == 2
+
+
+def test_write_and_read_back():
+    headers, moves = next(read_games(io.StringIO(COMMENTED_GAME)))
+    assert next(read_games(io.StringIO(format_game(headers, moves))))[1] == moves
+
+
+def test_bad_game_is_skipped():
+    errors = []
+    games = list(read_games(io.StringIO(MIXED_GAMES), on_error=lambda headers, error: errors.append(headers['Event'])))
+    assert [headers['Event'] for headers, _ in games] == ['En passant', 'Clean']
+    assert len(games[0][1]) == 5
+    assert len(games[1][1]) == 3
+    assert errors == ['Null move', 'Bad move']
+
+
+def test_skipped_game_reported_on_stderr(capsys):
+    games = list(read_games(io.StringIO(MIXED_GAMES)))
+    assert len(games) == 2
+    assert capsys.readouterr().err.count('Skipped game') == 2
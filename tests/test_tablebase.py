@@ -0,0 +1,20 @@
+import pytest
+
+from tablebase import Tablebases, generate, table_size
+
+
+@pytest.fixture(scope='module')
+def tables(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('tablebases'))
+    generate('KQK', directory)
+    generate('KRK', directory)
+    tables = Tablebases(directory)
+    yield tables
+    tables.close()
+
+
+@pytest.mark.parametrize('signature, longest', [('KQK', 20), ('KRK', 32)])
+def test_longest_mate(tables, signature, longest):
+    # Stored values are 1 plus plies to mate, so the longest win is the maximum less one
+    values = [tables.value(signature, index) for index in range(table_size(signature))]
+    assert max(values) - 1 == longest
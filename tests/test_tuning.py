@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import tuning
+from core import GameState
+from evaluation import evaluate
+
+
+@pytest.fixture(scope='module')
+def positions():
+    """FENs and evaluate() scores from random games"""
+    rng = random.Random(1)
+    fens, scores = [], []
+    for _ in range(20):
+        state = GameState()
+        for _ in range(rng.randint(10, 80)):
+            moves = state.legal_moves()
+            if not moves:
+                break
+            state.make_move(rng.choice(moves))
+            fens.append(state.to_fen())
+            scores.append(evaluate(state))
+    return fens, scores
+
+
+def test_batch_matches_evaluate(positions):
+    fens, scores = positions
+    codes, white_to_play, _ = tuning.parse_positions(fens)
+    batch = tuning.evaluate_batch(tuning.planes_from_codes(codes), white_to_play)
+    assert np.count_nonzero(batch != np.array(scores)) == 0
+
+
+def test_king_zone_feature_takes_both_signs(positions):
+    # Otherwise the parity check says nothing about the king zone sign
+    codes, _, _ = tuning.parse_positions(positions[0])
+    zone = tuning.extract_features(tuning.planes_from_codes(codes))[0][:, tuning.KING_ZONE_FEATURE]
+    assert (zone > 0).any() and (zone < 0).any()
+
+
+def test_king_zone_feature_sign():
+    # Black's queen attacking white's king zone counts against white
+    codes, _, _ = tuning.parse_positions(['6k1/5ppp/8/8/8/8/5PPP/q5K1 w - - 0 1'])
+    features, _ = tuning.extract_features(tuning.planes_from_codes(codes))
+    assert features[0, tuning.KING_ZONE_FEATURE] < 0
+
+
+def test_pack_round_trip(positions):
+    codes, white_to_play, results = tuning.parse_positions([fen + ' [1.0]' for fen in positions[0]])
+    unpacked = tuning.unpack_positions(tuning.pack_positions(codes, white_to_play, results))
+    assert (unpacked[0] == codes).all()
+    assert (unpacked[1] == white_to_play).all()
+    assert np.allclose(unpacked[2], results)
@@ -0,0 +1,404 @@
+"""Batch evaluation and Texel tuning with NumPy
+
+Positions are converted in bulk into piece planes, one 64-bit bitboard per
+piece in 'PNBRQKpnbrqk' order with bit row * 8 + col set for each square it
+stands on. Every evaluation term is computed for the whole batch with array
+operations, and evaluate_batch() gives the same scores as
+evaluation.evaluate() one position at a time.
+
+Position files are streamed in chunks. A text file has a FEN or EPD per line
+followed by the game result (1-0, 0-1, 1/2-1/2 or a score from 0 to 1 for
+white), e.g. 'rnbqkbnr/... b KQkq - 0 1 [0.5]' or the 'c9 "1-0";' EPD style.
+A packed file, written by pack_file(), starts with MAGIC and holds one
+PACKED_DTYPE record per position: the 64 squares as 4-bit piece codes, the
+side to move and the result.
+"""
+
+import itertools
+import json
+import math
+import re
+import time
+
+import numpy as np
+
+from attacks import KING_TARGETS
+from evaluation import (
+    EG_PST, EG_VALUES, KING_ZONE_ATTACK_PENALTY, MG_PST, MG_VALUES, MOBILITY_WEIGHTS, PAWN_SHIELD_BONUS,
+    PHASE_WEIGHTS, TOTAL_PHASE,
+)
+
+PIECES = 'PNBRQKpnbrqk'
+KINDS = 'pnbrqk'
+MOBILITY_KINDS = 'nbrq'
+CHUNK_SIZE = 16384  # Positions per chunk read from disk
+
+MAGIC = b'CHESSPOS'
+# Square pairs as nibbles (even square in the low half), side to move 1 for
+# white and the result for white in half points, 255 when unknown
+PACKED_DTYPE = np.dtype([('board', 'u1', 32), ('white_to_play', 'u1'), ('result', 'u1')])
+NO_RESULT = 255
+
+# Piece character to piece code, 0 for an empty square
+CODES = np.zeros(256, np.uint8)
+for _code, _piece in enumerate(PIECES, 1):
+    CODES[ord(_piece)] = _code
+GAME_RESULTS = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}
+GAME_RESULT_RE = re.compile(r'1-0|0-1|1/2-1/2')
+
+# Feature columns: piece-square counts, material, mobility and king safety,
+# each white's minus black's with black's squares mirrored top to bottom. The
+# king zone column, like evaluate(), counts attacks on black's king zone
+# minus attacks on white's
+PST_FEATURES = 0
+MATERIAL_FEATURES = PST_FEATURES + 6 * 64
+MOBILITY_FEATURES = MATERIAL_FEATURES + 5  # The king has no material feature
+KING_ZONE_FEATURE = MOBILITY_FEATURES + len(MOBILITY_KINDS)
+PAWN_SHIELD_FEATURE = KING_ZONE_FEATURE + 1
+FEATURE_COUNT = PAWN_SHIELD_FEATURE + 1
+
+ALL_SQUARES = np.uint64(0xFFFFFFFFFFFFFFFF)
+NOT_COL_0 = np.uint64(0xFEFEFEFEFEFEFEFE)
+NOT_COL_7 = np.uint64(0x7F7F7F7F7F7F7F7F)
+NOT_COL_01 = np.uint64(0xFCFCFCFCFCFCFCFC)
+NOT_COL_67 = np.uint64(0x3F3F3F3F3F3F3F3F)
+# Bit shift for each direction, with the mask that stops it wrapping round the board
+ROOK_STEPS = ((-8, ALL_SQUARES), (8, ALL_SQUARES), (-1, NOT_COL_7), (1, NOT_COL_0))
+BISHOP_STEPS = ((-9, NOT_COL_7), (-7, NOT_COL_0), (7, NOT_COL_7), (9, NOT_COL_0))
+KNIGHT_STEPS = tuple((row * 8 + col, {-2: NOT_COL_67, -1: NOT_COL_7, 1: NOT_COL_0, 2: NOT_COL_01}[col])
+                     for row, col in ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)))
+SLIDER_STEPS = {'b': BISHOP_STEPS, 'r': ROOK_STEPS, 'q': ROOK_STEPS + BISHOP_STEPS}
+
+
+def _bitboard(squares):
+    return sum(1 << (row * 8 + col) for row, col in squares)
+
+
+KING_ZONES = np.array([_bitboard(targets) for targets in KING_TARGETS], np.uint64)
+# The three squares in front of a king on each square, for white and black
+PAWN_SHIELDS = {
+    white: np.array([_bitboard((square // 8 + step, square % 8 + offset) for offset in (-1, 0, 1)
+                               if 0 <= square // 8 + step < 8 and 0 <= square % 8 + offset < 8)
+                     for square in range(64)], np.uint64)
+    for white, step in ((True, -1), (False, 1))
+}
+PHASE_VECTOR = np.array([PHASE_WEIGHTS[piece] for piece in PIECES], np.int64)
+
+
+def _shift(bitboards, step):
+    return bitboards << np.uint64(step) if step > 0 else bitboards >> np.uint64(-step)
+
+
+def _slider_attacks(sliders, empty, step, mask):
+    """Squares attacked along one direction, blockers included (Kogge-Stone fill)"""
+    propagate = empty & mask
+    sliders = sliders | propagate & _shift(sliders, step)
+    propagate = propagate & _shift(propagate, step)
+    sliders |= propagate & _shift(sliders, 2 * step)
+    propagate &= _shift(propagate, 2 * step)
+    sliders |= propagate & _shift(sliders, 4 * step)
+    return _shift(sliders, step) & mask
+
+
+def planes_from_codes(codes):
+    """(N, 12) piece planes from an (N, 64) array of piece codes"""
+    planes = np.empty((len(codes), 12), np.uint64)
+    for index in range(12):
+        planes[:, index] = np.packbits(codes == index + 1, axis=1, bitorder='little').view(np.uint64)[:, 0]
+    return planes
+
+
+def _parse_result(fields):
+    text = ' '.join(fields)
+    match = GAME_RESULT_RE.search(text)
+    if match:
+        return GAME_RESULTS[match.group()]
+    try:
+        return float(fields[0].strip('[]|";'))
+    except (IndexError, ValueError):
+        return math.nan
+
+
+def parse_positions(lines):
+    """(piece codes, white_to_play, results) for FEN or EPD lines, results NaN where missing"""
+    boards = []
+    sides = []
+    results = []
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 2:
+            continue
+        boards.append(fields[0])
+        sides.append(fields[1] == 'w')
+        rest = fields[4:]
+        # Skip the move counters of a full FEN
+        if len(rest) >= 2 and rest[0].isdigit() and rest[1].isdigit():
+            rest = rest[2:]
+        results.append(_parse_result(rest))
+    # Expand the whole chunk at once: digits become runs of '.', one per empty square
+    text = ''.join(boards).replace('/', '')
+    for count in range(1, 9):
+        text = text.replace(str(count), '.' * count)
+    if len(text) != 64 * len(boards):
+        for board in boards:
+            if len(''.join('.' * int(char) if char.isdigit() else char for char in board.replace('/', ''))) != 64:
+                raise ValueError(f"Invalid FEN board: {board}")
+    codes = CODES[np.frombuffer(text.encode('ascii'), np.uint8)].reshape(-1, 64)
+    return codes, np.array(sides, bool), np.array(results, np.float32)
+
+
+def pack_positions(codes, white_to_play, results):
+    """PACKED_DTYPE records for arrays from parse_positions()"""
+    records = np.zeros(len(codes), PACKED_DTYPE)
+    records['board'] = codes[:, 0::2] | codes[:, 1::2] << 4
+    records['white_to_play'] = white_to_play
+    records['result'] = np.where(np.isnan(results), NO_RESULT, np.rint(np.nan_to_num(results) * 2)).astype(np.uint8)
+    return records
+
+
+def unpack_positions(records):
+    """(piece codes, white_to_play, results) from PACKED_DTYPE records"""
+    codes = np.empty((len(records), 64), np.uint8)
+    codes[:, 0::2] = records['board'] & 15
+    codes[:, 1::2] = records['board'] >> 4
+    results = np.where(records['result'] == NO_RESULT, np.nan, records['result'] / 2).astype(np.float32)
+    return codes, records['white_to_play'].astype(bool), results
+
+
+def read_positions(path, chunk_size=CHUNK_SIZE):
+    """Yield (planes, white_to_play, results) chunks from a text or packed position file"""
+    with open(path, 'rb') as stream:
+        packed = stream.read(len(MAGIC)) == MAGIC
+    if packed:
+        with open(path, 'rb') as stream:
+            stream.seek(len(MAGIC))
+            while True:
+                data = stream.read(chunk_size * PACKED_DTYPE.itemsize)
+                if not data:
+                    break
+                codes, white_to_play, results = unpack_positions(np.frombuffer(data, PACKED_DTYPE))
+                yield planes_from_codes(codes), white_to_play, results
+        return
+    with open(path) as stream:
+        lines = (line for line in stream if line.strip() and not line.startswith('#'))
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                break
+            codes, white_to_play, results = parse_positions(chunk)
+            yield planes_from_codes(codes), white_to_play, results
+
+
+def pack_file(source, destination, chunk_size=CHUNK_SIZE):
+    """Convert a text position file to the packed form and return the number of positions"""
+    count = 0
+    with open(source) as stream, open(destination, 'wb') as output:
+        output.write(MAGIC)
+        lines = (line for line in stream if line.strip() and not line.startswith('#'))
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                break
+            records = pack_positions(*parse_positions(chunk))
+            output.write(records.tobytes())
+            count += len(records)
+    return count
+
+
+def extract_features(planes):
+    """(features, phase) for a batch of piece planes
+
+    features is an (N, FEATURE_COUNT) float32 array of white-minus-black term
+    counts, which the evaluation weighs with a middlegame and an endgame
+    parameter each; phase is the game phase clamped to TOTAL_PHASE.
+    """
+    count = len(planes)
+    features = np.zeros((count, FEATURE_COUNT), np.float32)
+    bits = np.unpackbits(planes.view(np.uint8).reshape(count, 12, 8), axis=2, bitorder='little')
+    white = bits[:, :6].astype(np.int8)
+    black = bits[:, 6:].reshape(count, 6, 8, 8)[:, :, ::-1].reshape(count, 6, 64)
+    features[:, PST_FEATURES:MATERIAL_FEATURES] = (white - black).reshape(count, 6 * 64)
+    pieces = np.bitwise_count(planes).astype(np.int64)
+    features[:, MATERIAL_FEATURES:MOBILITY_FEATURES] = pieces[:, 0:5] - pieces[:, 6:11]
+    phase = np.minimum(pieces @ PHASE_VECTOR, TOTAL_PHASE)
+
+    occupied = {white_side: np.bitwise_or.reduce(planes[:, 0:6] if white_side else planes[:, 6:12], axis=1)
+                for white_side in (True, False)}
+    empty = ~(occupied[True] | occupied[False])
+    # Index of the single bit in each king plane
+    kings = {True: np.bitwise_count(planes[:, 5] - np.uint64(1)), False: np.bitwise_count(planes[:, 11] - np.uint64(1))}
+    zone_attacks = {}
+    for white_side, offset, sign in ((True, 0, 1), (False, 6, -1)):
+        not_own = ~occupied[white_side]
+        zone = KING_ZONES[kings[not white_side]]
+        attacks_on_zone = np.zeros(count, np.int64)
+        for column, kind in enumerate(MOBILITY_KINDS, MOBILITY_FEATURES):
+            pieces = planes[:, offset + PIECES.index(kind.upper())]
+            mobility = np.zeros(count, np.int64)
+            # One piece at most attacks a square from each direction, so
+            # counting per direction counts every piece's moves
+            for step, mask in KNIGHT_STEPS if kind == 'n' else SLIDER_STEPS[kind]:
+                if kind == 'n':
+                    attacked = _shift(pieces, step) & mask
+                else:
+                    attacked = _slider_attacks(pieces, empty, step, mask)
+                mobility += np.bitwise_count(attacked & not_own)
+                attacks_on_zone += np.bitwise_count(attacked & zone)
+            features[:, column] += sign * mobility
+        zone_attacks[white_side] = attacks_on_zone
+    features[:, KING_ZONE_FEATURE] = zone_attacks[True] - zone_attacks[False]
+    features[:, PAWN_SHIELD_FEATURE] = (
+        np.bitwise_count(PAWN_SHIELDS[True][kings[True]] & planes[:, 0]).astype(np.int64)
+        - np.bitwise_count(PAWN_SHIELDS[False][kings[False]] & planes[:, 6]))
+    return features, phase
+
+
+def default_parameters():
+    """(middlegame, endgame) weight vectors for extract_features() from the evaluation constants"""
+    middlegame = np.zeros(FEATURE_COUNT)
+    endgame = np.zeros(FEATURE_COUNT)
+    for index, kind in enumerate(KINDS):
+        middlegame[PST_FEATURES + index * 64:PST_FEATURES + index * 64 + 64] = MG_PST[kind]
+        endgame[PST_FEATURES + index * 64:PST_FEATURES + index * 64 + 64] = EG_PST[kind]
+        if kind != 'k':
+            middlegame[MATERIAL_FEATURES + index] = MG_VALUES[kind]
+            endgame[MATERIAL_FEATURES + index] = EG_VALUES[kind]
+    for index, kind in enumerate(MOBILITY_KINDS):
+        middlegame[MOBILITY_FEATURES + index], endgame[MOBILITY_FEATURES + index] = MOBILITY_WEIGHTS[kind]
+    # King safety only counts in the middlegame
+    middlegame[KING_ZONE_FEATURE] = KING_ZONE_ATTACK_PENALTY
+    middlegame[PAWN_SHIELD_FEATURE] = PAWN_SHIELD_BONUS
+    return middlegame, endgame
+
+
+def parameters_to_dict(middlegame, endgame):
+    """Weight vectors as rounded evaluation constants, ready to be written out as JSON"""
+    middlegame = np.rint(middlegame).astype(int).tolist()
+    endgame = np.rint(endgame).astype(int).tolist()
+    return {
+        'MG_VALUES': {kind: middlegame[MATERIAL_FEATURES + index] for index, kind in enumerate(KINDS[:5])},
+        'EG_VALUES': {kind: endgame[MATERIAL_FEATURES + index] for index, kind in enumerate(KINDS[:5])},
+        'MG_PST': {kind: middlegame[PST_FEATURES + index * 64:PST_FEATURES + index * 64 + 64]
+                   for index, kind in enumerate(KINDS)},
+        'EG_PST': {kind: endgame[PST_FEATURES + index * 64:PST_FEATURES + index * 64 + 64]
+                   for index, kind in enumerate(KINDS)},
+        'MOBILITY_WEIGHTS': {kind: (middlegame[MOBILITY_FEATURES + index], endgame[MOBILITY_FEATURES + index])
+                             for index, kind in enumerate(MOBILITY_KINDS)},
+        'KING_ZONE_ATTACK_PENALTY': middlegame[KING_ZONE_FEATURE],
+        'PAWN_SHIELD_BONUS': middlegame[PAWN_SHIELD_FEATURE],
+    }
+
+
+def evaluate_batch(planes, white_to_play, parameters=None):
+    """Scores in centipawns from the side to move's point of view, as evaluation.evaluate() gives them"""
+    middlegame, endgame = parameters if parameters is not None else default_parameters()
+    features, phase = extract_features(planes)
+    mg = np.rint(features @ middlegame.astype(np.float32)).astype(np.int64)
+    eg = np.rint(features @ endgame.astype(np.float32)).astype(np.int64)
+    scores = (mg * phase + eg * (TOTAL_PHASE - phase)) // TOTAL_PHASE
+    return np.where(white_to_play, scores, -scores)
+
+
+def _white_scores(features, phase, middlegame, endgame):
+    """Unrounded evaluation from white's point of view, for tuning"""
+    weight = phase / TOTAL_PHASE
+    return (features @ middlegame) * weight + (features @ endgame) * (1 - weight)
+
+
+def _win_probability(scores, k):
+    return 1 / (1 + 10 ** (-k * scores / 400))
+
+
+def _labelled(chunks):
+    """Feature chunks for positions that have a result"""
+    for planes, _, results in chunks:
+        known = ~np.isnan(results)
+        if known.any():
+            features, phase = extract_features(planes[known])
+            yield features.astype(np.float64), phase.astype(np.float64), results[known].astype(np.float64)
+
+
+def fit_scaling(path, parameters, chunk_size=CHUNK_SIZE, sample_size=1000000):
+    """The sigmoid scale K that best maps the evaluation to the results of a sample of positions"""
+    middlegame, endgame = parameters
+    scores, results = [], []
+    sampled = 0
+    for features, phase, chunk_results in _labelled(read_positions(path, chunk_size)):
+        scores.append(_white_scores(features, phase, middlegame, endgame))
+        results.append(chunk_results)
+        sampled += len(chunk_results)
+        if sampled >= sample_size:
+            break
+    if not scores:
+        raise ValueError(f"No positions with results in {path}")
+    scores, results = np.concatenate(scores), np.concatenate(results)
+
+    def error(k):
+        return np.mean((results - _win_probability(scores, k)) ** 2)
+
+    # Golden section search; the error is unimodal in K
+    low, high = 0.05, 5.0
+    ratio = (math.sqrt(5) - 1) / 2
+    for _ in range(60):
+        left, right = high - ratio * (high - low), low + ratio * (high - low)
+        if error(left) < error(right):
+            high = right
+        else:
+            low = left
+    return (low + high) / 2
+
+
+def tune(path, epochs=10, chunk_size=CHUNK_SIZE, learning_rate=1.0, k=None, output=None, parameters=None):
+    """Texel tuning: fit the evaluation weights to game results by gradient descent
+
+    Minimises the mean squared difference between each result and the win
+    probability sigmoid(K * score) over the positions in path, taking an Adam
+    step per chunk so files of any size stream from disk. K is fitted to the
+    starting weights unless given. Prints the error and speed after each
+    epoch, writes the tuned constants to output as JSON if given and returns
+    the (middlegame, endgame) weights.
+    """
+    middlegame, endgame = (np.array(vector, np.float64) for vector in (parameters or default_parameters()))
+    if k is None:
+        k = fit_scaling(path, (middlegame, endgame), chunk_size)
+        print(f"K {k:.4f}")
+    # King safety has no endgame weight, so its gradient is dropped there
+    endgame_mask = np.ones(FEATURE_COUNT)
+    endgame_mask[[KING_ZONE_FEATURE, PAWN_SHIELD_FEATURE]] = 0
+
+    weights = np.concatenate([middlegame, endgame])
+    first_moment = np.zeros_like(weights)
+    second_moment = np.zeros_like(weights)
+    beta1, beta2 = 0.9, 0.999
+    step = 0
+    for epoch in range(1, epochs + 1):
+        start = time.perf_counter()
+        total_error = 0.0
+        positions = 0
+        for features, phase, results in _labelled(read_positions(path, chunk_size)):
+            probability = _win_probability(_white_scores(features, phase, weights[:FEATURE_COUNT],
+                                                         weights[FEATURE_COUNT:]), k)
+            total_error += np.sum((results - probability) ** 2)
+            positions += len(results)
+            # d(error)/d(score) for each position, then through the phase blend to the weights
+            slope = 2 * (probability - results) * probability * (1 - probability) * k * math.log(10) / 400
+            weight = phase / TOTAL_PHASE
+            gradient = np.concatenate([features.T @ (slope * weight),
+                                       features.T @ (slope * (1 - weight)) * endgame_mask]) / len(results)
+
+            step += 1
+            first_moment = beta1 * first_moment + (1 - beta1) * gradient
+            second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+            corrected_first = first_moment / (1 - beta1 ** step)
+            corrected_second = second_moment / (1 - beta2 ** step)
+            weights -= learning_rate * corrected_first / (np.sqrt(corrected_second) + 1e-8)
+        elapsed = time.perf_counter() - start
+        print(f"epoch {epoch:>3}  error {total_error / max(positions, 1):.6f}  positions {positions}  "
+              f"{positions / max(elapsed, 1e-9):.0f} positions/s")
+
+    middlegame, endgame = weights[:FEATURE_COUNT], weights[FEATURE_COUNT:]
+    if output:
+        with open(output, 'w') as stream:
+            json.dump(parameters_to_dict(middlegame, endgame), stream, indent=2)
+            stream.write('\n')
+    return middlegame, endgame
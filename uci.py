@@ -0,0 +1,301 @@
+"""UCI protocol front end so the engine can run under chess GUIs and tournament managers
+
+Commands are read on the main thread while the search runs on a background
+thread, so stop and ponderhit take effect during a search.
+"""
+
+import multiprocessing
+import sys
+import threading
+
+import brain
+from book import PolyglotBook
+from core import GameState, STARTING_FEN, move_from_uci, move_to_uci
+from tablebase import Tablebases
+
+ENGINE_NAME = "chess-engine"
+MOVE_OVERHEAD = 0.05  # Seconds kept back per move for communication lag
+DEFAULT_MOVES_TO_GO = 30  # Assumed moves left in sudden death time controls
+
+
+def allocate_time(params, white):
+    """Seconds to spend on this move from the go parameters, or None for no time limit"""
+    if 'movetime' in params:
+        return max(params['movetime'] / 1000 - MOVE_OVERHEAD, 0.01)
+    remaining = params.get('wtime' if white else 'btime')
+    if remaining is None:
+        return None
+    increment = params.get('winc' if white else 'binc', 0) / 1000
+    remaining /= 1000
+    moves_to_go = params.get('movestogo', DEFAULT_MOVES_TO_GO)
+    budget = remaining / max(moves_to_go, 1) + increment * 0.8
+    # Never plan to use more than half the clock on one move
+    return max(min(budget, remaining / 2) - MOVE_OVERHEAD, 0.01)
+
+
+def format_score(score):
+    if score > brain.MATE_BOUND:
+        return f"mate {(brain.MATE - score + 1) // 2}"
+    if score < -brain.MATE_BOUND:
+        return f"mate {-((brain.MATE + score + 1) // 2)}"
+    return f"cp {score}"
+
+
+class UciEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.state = GameState()
+        self.position = (STARTING_FEN, [])  # FEN and moves the state was built from
+        self.hash_mb = 16
+        self.threads = 1
+        self.tt = None  # Created on first use so setoption can change its size
+        self.book = None
+        self.own_book = False
+        self.book_selection = 'weighted'
+        self.tablebase = None
+        self.search_thread = None
+        self.stop_event = None
+        self.release = None  # Holds bestmove back while pondering or in infinite mode
+        self.ponder_time = None  # Time budget that starts at ponderhit
+        self.timer = None
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def table(self):
+        if self.tt is None:
+            if self.threads > 1:
+                self.tt = brain.SharedTranspositionTable(self.hash_mb)
+            else:
+                self.tt = brain.TranspositionTable(self.hash_mb)
+        return self.tt
+
+    def free_table(self):
+        if isinstance(self.tt, brain.SharedTranspositionTable):
+            self.tt.close()
+            self.tt.unlink()
+        self.tt = None
+
+    def handle(self, line):
+        """Act on one line of input, returns False on quit"""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author chess-engine authors")
+            self.send("option name Hash type spin default 16 min 1 max 4096")
+            self.send(f"option name Threads type spin default 1 min 1 max {multiprocessing.cpu_count()}")
+            self.send("option name Ponder type check default false")
+            self.send("option name OwnBook type check default false")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name BookSelection type combo default weighted var weighted var best var uniform")
+            self.send("option name TablebaseDir type string default <empty>")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.wait_for_search()
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.wait_for_search()
+            if self.tt is not None:
+                self.tt.clear()
+        elif command == 'position':
+            self.wait_for_search()
+            self.set_position(args)
+        elif command == 'go':
+            self.wait_for_search()
+            self.go(args)
+        elif command == 'stop':
+            self.stop()
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'quit':
+            self.wait_for_search()
+            self.free_table()
+            self.close_book()
+            self.close_tablebase()
+            return False
+        return True
+
+    def set_option(self, args):
+        if 'name' not in args or 'value' not in args:
+            return
+        name = ' '.join(args[args.index('name') + 1:args.index('value')]).lower()
+        value = ' '.join(args[args.index('value') + 1:])
+        if name == 'hash':
+            self.hash_mb = max(1, int(value))
+            self.free_table()
+        elif name == 'threads':
+            threads = max(1, int(value))
+            # One worker uses a private table, more need a shared one
+            if (threads > 1) != (self.threads > 1):
+                self.free_table()
+            self.threads = threads
+        elif name == 'ownbook':
+            self.own_book = value.lower() == 'true'
+        elif name == 'bookfile':
+            self.close_book()
+            if value and value != '<empty>':
+                try:
+                    self.book = PolyglotBook(value, self.book_selection)
+                except OSError as error:
+                    self.send(f"info string cannot open book {value}: {error}")
+        elif name == 'tablebasedir':
+            self.close_tablebase()
+            if value and value != '<empty>':
+                self.tablebase = Tablebases(value)
+        elif name == 'bookselection' and value in PolyglotBook.SELECTIONS:
+            self.book_selection = value
+            if self.book is not None:
+                self.book.selection = value
+
+    def close_tablebase(self):
+        if self.tablebase is not None:
+            self.tablebase.close()
+            self.tablebase = None
+
+    def close_book(self):
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+
+    def set_position(self, args):
+        if not args:
+            return
+        if args[0] == 'startpos':
+            fen, rest = STARTING_FEN, args[1:]
+        elif args[0] == 'fen':
+            end = args.index('moves') if 'moves' in args else len(args)
+            fen, rest = ' '.join(args[1:end]), args[end:]
+        else:
+            return
+        moves = rest[1:] if rest and rest[0] == 'moves' else []
+
+        # GUIs resend the whole game every move, so only play the new moves
+        # when the position extends the previous one
+        old_fen, old_moves = self.position
+        if fen == old_fen and moves[:len(old_moves)] == old_moves:
+            new_moves = moves[len(old_moves):]
+        else:
+            self.state = GameState()
+            self.state.load_fen(fen)
+            new_moves = moves
+
+        played = moves[:len(moves) - len(new_moves)]
+        for text in new_moves:
+            move = move_from_uci(self.state, text)
+            if move is None:
+                self.send(f"info string illegal move {text}")
+                break
+            self.state.make_move(move)
+            played.append(text)
+        self.position = (fen, played)
+
+    def go(self, args):
+        params = {}
+        flags = set()
+        index = 0
+        while index < len(args):
+            name = args[index]
+            if name in ('infinite', 'ponder'):
+                flags.add(name)
+                index += 1
+            elif index + 1 < len(args):
+                try:
+                    params[name] = int(args[index + 1])
+                except ValueError:
+                    pass
+                index += 2
+            else:
+                index += 1
+
+        # Book moves are played at once, except when the GUI wants an analysis
+        if self.own_book and self.book is not None and not flags:
+            move = self.book.choose(self.state)
+            if move is not None:
+                self.send(f"bestmove {move_to_uci(move)}")
+                return
+
+        time_limit = allocate_time(params, self.state.white_to_play)
+        self.ponder_time = None
+        if flags:
+            # Search until told to stop; a ponderhit starts the clock
+            self.ponder_time = time_limit
+            time_limit = None
+
+        self.stop_event = multiprocessing.Event() if self.threads > 1 else threading.Event()
+        self.release = threading.Event()
+        if not flags:
+            self.release.set()
+        self.search_thread = threading.Thread(
+            target=self.search, args=(time_limit, params.get('nodes'), params.get('depth')), daemon=True)
+        self.search_thread.start()
+
+    def search(self, time_limit, node_limit, max_depth):
+        if self.threads > 1:
+            search = brain.parallel_search(self.state, self.threads, time_limit, node_limit, max_depth, self.table(),
+                                           stop_event=self.stop_event, on_iteration=self.report,
+                                           tablebase=self.tablebase)
+        else:
+            search = brain.Search(self.state, time_limit, node_limit, max_depth, self.table(), self.stop_event,
+                                  on_iteration=self.report, tablebase=self.tablebase)
+            search.run()
+
+        line = search.principal_variation() if search.best_move is not None else []
+        # UCI doesn't allow bestmove before stop or ponderhit when pondering
+        self.release.wait()
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if search.best_move is None:
+            self.send("bestmove 0000")
+        elif len(line) > 1:
+            self.send(f"bestmove {move_to_uci(search.best_move)} ponder {move_to_uci(line[1])}")
+        else:
+            self.send(f"bestmove {move_to_uci(search.best_move)}")
+
+    def report(self, search):
+        elapsed = max(search.elapsed(), 1e-9)
+        pv = ' '.join(move_to_uci(move) for move in search.principal_variation())
+        self.send(f"info depth {search.completed_depth} score {format_score(search.best_score)} "
+                  f"nodes {search.nodes} nps {int(search.nodes / elapsed)} time {int(elapsed * 1000)} "
+                  f"hashfull {search.tt.hashfull()} pv {pv}")
+
+    def stop(self):
+        if self.search_thread is not None:
+            self.stop_event.set()
+            self.release.set()
+
+    def ponderhit(self):
+        """The opponent played the expected move, so the ponder search becomes a timed one"""
+        if self.search_thread is None or self.release.is_set():
+            return
+        if self.ponder_time is not None:
+            self.timer = threading.Timer(self.ponder_time, self.stop_event.set)
+            self.timer.start()
+        self.release.set()
+
+    def wait_for_search(self):
+        """Stop a running search and wait for its bestmove"""
+        if self.search_thread is not None:
+            self.stop()
+            self.search_thread.join()
+            self.search_thread = None
+
+
+def main(input_stream=sys.stdin):
+    engine = UciEngine()
+    while True:
+        line = input_stream.readline()
+        if not line or not engine.handle(line):
+            break
+    engine.wait_for_search()
+    engine.free_table()
+    engine.close_book()
+    engine.close_tablebase()